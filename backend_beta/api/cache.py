@@ -0,0 +1,105 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import CatalogVersion
+
+"""
+* get_catalog_version -> Finds the current catalog version of a tier
+*
+* INPUTS
+*   tier (String) -> 'free' or 'paid'
+*
+* OUTPUTS
+*   version (int) -> The version raised by the ingest, or 0 if the tier has never been ingested
+*
+* ADDITIONAL
+* The version itself is cached for CATALOG_VERSION_TIMEOUT seconds, so at most one small query is made per tier in that time.
+* A new ingest is therefore picked up at most that many seconds late
+"""
+def get_catalog_version(tier):
+    version_key = f"catalog:{tier}:version"
+    version = cache.get(version_key)
+
+    if version == None:
+        version = CatalogVersion.objects.filter(tier=tier).values_list('version', flat=True).first() or 0
+        cache.set(version_key, version, settings.CATALOG_VERSION_TIMEOUT)
+
+    return version
+
+"""
+* catalog_cache_key -> Builds the cache key and the ETag of a catalog response
+*
+* INPUTS
+*   tier (String) -> 'free' or 'paid'
+*   request -> The request being answered
+*
+* OUTPUTS
+*   key (String) -> catalog:<tier>:<version>:<hash of the full path, query string included>
+*   etag (String) -> The strong ETag "<tier>-<version>-<short hash of the full path>"
+*
+* ADDITIONAL
+* The body of a response only changes when the catalog version of its tier or the request itself changes, so both can be
+* derived without building the response
+"""
+def catalog_cache_key(tier, request):
+    version = get_catalog_version(tier)
+    path_hash = hashlib.sha256(request.get_full_path().encode('utf-8')).hexdigest()
+    return f"catalog:{tier}:{version}:{path_hash}", f'"{tier}-{version}-{path_hash[:16]}"'
+
+"""
+* etag_matches -> Checks whether an If-None-Match header holds the given ETag
+*
+* INPUTS
+*   header (String) -> The If-None-Match header, or None
+*   etag (String) -> The quoted ETag of the response
+*
+* OUTPUTS
+*   matches (bool) -> True if the client already has this exact response
+"""
+def etag_matches(header, etag):
+    if not header:
+        return False
+
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+"""
+* CatalogCacheMixin -> This mixin keeps the responses of a catalog ListAPIView in Django's cache and lets clients revalidate them
+*
+* FIELDS
+*   catalog_tier -> The tier ('free' or 'paid') of the data that the view returns. It is part of every key and ETag
+*   list() -> Answers 304 if the client sent the current ETag, otherwise returns the cached data or builds and caches it
+*
+* ADDITIONAL
+* The permissions of the view are checked before list() runs, so a user that may not read a tier never reaches its cache.
+* Only successful responses are cached and tagged. Entries of older catalog versions are never read again and simply expire.
+* A 304 costs no queries once the catalog version is cached
+"""
+class CatalogCacheMixin:
+    catalog_tier = None
+
+    def list(self, request, *args, **kwargs):
+        key, etag = catalog_cache_key(self.catalog_tier, request)
+
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        else:
+            data = cache.get(key)
+            if data != None:
+                response = Response(data)
+            else:
+                response = super().list(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+
+        # The client has to revalidate before reusing its copy, which costs a 304 while the catalog is unchanged
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
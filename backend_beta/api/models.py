@@ -9,10 +9,14 @@ from authentication.models import CustomUser
 * 
 * FIELDS
 *   lessonTitle (Char Field, unique not null) -> The title of the lesson
+*   updated_at (Date Time) -> When the lesson was last changed
+*   catalog_version (Big Integer, indexed) -> The catalog version of the ingest that last changed the lesson (see CatalogVersion)
 """
 class FreeLesson(models.Model):
     lesson_title = models.CharField(max_length=255, unique=True)
     num_tasks = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    catalog_version = models.BigIntegerField(default=0, db_index=True)
 
     def __str__(self):
         return self.lesson_title
@@ -23,10 +27,14 @@ class FreeLesson(models.Model):
 *
 * FIELDS 
 *   lessonTitle (Char Field, unique not null) -> The title of the lesson
+*   updated_at (Date Time) -> When the lesson was last changed
+*   catalog_version (Big Integer, indexed) -> The catalog version of the ingest that last changed the lesson (see CatalogVersion)
 """
 class PaidLesson(models.Model):
     lesson_title = models.CharField(max_length=255, unique=True)
     num_tasks = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    catalog_version = models.BigIntegerField(default=0, db_index=True)
 
     def __str__(self):
         return self.lesson_title
@@ -40,10 +48,20 @@ class PaidLesson(models.Model):
 *   taskTitle (Char Field, unique not null) -> The title of the task
 *   lesson (Foreign Key Reference) -> a reference to an existing free lesson object. This will represent what lesson the task is a part of 
 *   content (JSON) -> The content of the task itself
+*   media_manifest (JSON, nullable) -> The content type, byte size and reachability of each media link in the content, keyed by url. Null until the links have been checked
+*   content_hash (Char Field) -> SHA-256 of the content, used by the ingest to skip tasks that have not changed
+*   is_removed (Boolean) -> Set when the task is no longer on the website. The row is kept so that user progress is not lost
+*   updated_at (Date Time) -> When the task was last changed
+*   catalog_version (Big Integer, indexed) -> The catalog version of the ingest that last inserted, changed or removed the task
 """
 class FreeTask(models.Model):
     task_title = models.CharField()
     content = models.JSONField()
+    media_manifest = models.JSONField(null=True, default=None)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    is_removed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    catalog_version = models.BigIntegerField(default=0, db_index=True)
     lesson = models.ForeignKey(FreeLesson, on_delete=models.CASCADE, related_name='task')
 
     class Meta:
@@ -59,10 +77,20 @@ class FreeTask(models.Model):
 *   taskTitle (Char Field, unique not null) -> The title of the task
 *   lesson (Foreign Key Reference) -> a reference to an existing paid lesson object. This will represent what lesson the task is a part of 
 *   content (JSON) -> The content of the task itself
+*   media_manifest (JSON, nullable) -> The content type, byte size and reachability of each media link in the content, keyed by url. Null until the links have been checked
+*   content_hash (Char Field) -> SHA-256 of the content, used by the ingest to skip tasks that have not changed
+*   is_removed (Boolean) -> Set when the task is no longer on the website. The row is kept so that user progress is not lost
+*   updated_at (Date Time) -> When the task was last changed
+*   catalog_version (Big Integer, indexed) -> The catalog version of the ingest that last inserted, changed or removed the task
 """
 class PaidTask(models.Model):
     task_title = models.CharField(unique=True)
     content = models.JSONField()
+    media_manifest = models.JSONField(null=True, default=None)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    is_removed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    catalog_version = models.BigIntegerField(default=0, db_index=True)
     lesson = models.ForeignKey(PaidLesson, on_delete=models.CASCADE, related_name='task')
 
     class Meta:
@@ -72,6 +100,27 @@ class PaidTask(models.Model):
         return self.task_title
 
 
+# ***** CATALOG VERSION MODEL *****
+"""
+* CatalogVersion -> A model that counts how many times the lessons and tasks of a tier have been changed by the ingest
+*
+* FIELDS
+*   tier (Char Field, unique) -> 'free' or 'paid'
+*   version (Big Integer) -> Raised by one by database_main at the end of every ingest of the tier
+*   updated_at (Date Time) -> When the version was last raised
+*
+* ADDITIONAL
+* The version is part of every cached catalog response key, so raising it makes all of the cached responses of the tier stale at once
+"""
+class CatalogVersion(models.Model):
+    tier = models.CharField(max_length=16, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.tier} v{self.version}"
+
+
 # ***** PROGRESS TRACKING MODELS *****
 """
 * UserCompletedFreeTasks -> This model will be used to keep track of what users have completed what tasks. To be reflected on the frontend
@@ -0,0 +1,22 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+"""
+* TaskCursorPagination -> This class pages through a task listing with an opaque cursor on the task id
+*   Each page is read with an indexed "WHERE id > last id ORDER BY id LIMIT n", so every page costs the same
+*   however far into the listing it is, and tasks added while paging do not shift the pages
+*
+* FIELDS
+*   ordering -> The pages are ordered by the task id, which is unique and never changes
+*   page_size -> The number of tasks per page (TASK_PAGE_SIZE setting)
+*   page_size_query_param -> Lets a client ask for a different page size with ?page_size=
+*   max_page_size -> The largest page size a client can ask for (TASK_MAX_PAGE_SIZE setting)
+*
+* ADDITIONAL
+* The response holds the tasks under 'results' and the links to the pages around it under 'next' and 'previous'
+"""
+class TaskCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = settings.TASK_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.TASK_MAX_PAGE_SIZE
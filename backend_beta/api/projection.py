@@ -0,0 +1,52 @@
+from rest_framework.exceptions import ValidationError
+
+"""
+* FieldProjectionMixin -> This mixin lets a client pick the fields of a ListAPIView with ?fields=<name>,<name>
+*   For example /api/all-free-lessons/?fields=id,lesson_title or /api/free-tasks-by-lesson/1/?fields=id,task_title
+*
+* FIELDS
+*   fields_query_param -> The name of the query parameter holding the fields
+*   get_requested_fields() -> Reads the fields from the request. Returns None if every field is wanted
+*   filter_queryset() -> Only loads the columns of the requested fields (the primary key is always loaded)
+*   get_serializer() -> Only outputs the requested fields (see ProjectedModelSerializer)
+*
+* ADDITIONAL
+* The serializer class of the view has to be a ProjectedModelSerializer. Asking for a field that it does not have answers 400.
+* The columns that are left out, like the content of a task, are never read from the database.
+* The query string is part of the cache key and ETag of a catalog response, so each projection is cached on its own
+"""
+class FieldProjectionMixin:
+    fields_query_param = 'fields'
+
+    def get_requested_fields(self):
+        value = self.request.query_params.get(self.fields_query_param)
+        if not value:
+            return None
+
+        allowed = self.get_serializer_class().Meta.fields
+        requested = set(name.strip() for name in value.split(',') if name.strip() != '')
+
+        unknown = requested - set(allowed)
+        if len(unknown) > 0:
+            raise ValidationError({self.fields_query_param: f"Unknown fields: {', '.join(sorted(unknown))}. Choose from: {', '.join(allowed)}"})
+
+        # Keep the order of the serializer so that the same fields always give the same output
+        return [name for name in allowed if name in requested]
+
+    # filter_queryset() is used rather than get_queryset() since list() always runs it, even in views that build their own queryset
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        fields = self.get_requested_fields()
+        if fields == None:
+            return queryset
+
+        # A foreign key like 'lesson' only loads its lesson_id column
+        return queryset.only(*fields)
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields != None:
+            kwargs['fields'] = fields
+
+        return super().get_serializer(*args, **kwargs)
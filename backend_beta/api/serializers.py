@@ -11,6 +11,29 @@ and other metadata relevant to the serialization process
 """
 
 
+# ***** PROJECTION SERIALIZERS *****
+"""
+* ProjectedModelSerializer -> This is a ModelSerializer that can be told to only output some of its fields
+*
+* INPUTS
+*   Optional fields (list) -> The names of the fields to keep. Every field of Meta.fields is kept if this is not given
+*
+* ADDITIONAL
+* The other fields are dropped before anything is read from the instances, so a field that is left out never touches its column.
+* The views pass the fields picked with ?fields= (see FieldProjectionMixin)
+"""
+class ProjectedModelSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields != None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+
+
 # ***** LESSON SERIALIZERS *****
 """
 * FreeLessonSerializer -> This is a serializer used to serialize and deserialize FreeLesson models
@@ -22,7 +45,7 @@ and other metadata relevant to the serialization process
 *   id (integer) -> The primary key for the lesson
 *   lessonTitle (Email Field) -> The title of the lesson that has been passed as input
 """
-class FreeLessonSerializer(serializers.ModelSerializer):
+class FreeLessonSerializer(ProjectedModelSerializer):
     class Meta:
         model = FreeLesson
         fields = ['id', 'lesson_title', 'num_tasks']
@@ -36,7 +59,7 @@ class FreeLessonSerializer(serializers.ModelSerializer):
 *   id (integer) -> The primary key for the lesson
 *   lessonTitle (Char Field) -> The title of the lesson that has been passed as input
 """
-class PaidLessonSerializer(serializers.ModelSerializer):
+class PaidLessonSerializer(ProjectedModelSerializer):
     class Meta:
         model = PaidLesson
         fields = ['id', 'lesson_title', 'num_tasks']
@@ -54,12 +77,13 @@ class PaidLessonSerializer(serializers.ModelSerializer):
 *   id (integer) -> The primary key for the task
 *   taskTitle (Char field) -> The name of the task that is being serialized
 *   content (JSON) -> The content of the task in JSON format
+*   media_manifest (JSON) -> The content type, byte size and reachability of each media link in the content
 *   lesson (Foreign Key Reference) -> The reference to the lesson to which the task instance belongs
 """
-class FreeTaskSerializer(serializers.ModelSerializer):
+class FreeTaskSerializer(ProjectedModelSerializer):
     class Meta:
         model = FreeTask
-        fields = ['id', 'task_title', 'content', 'lesson']
+        fields = ['id', 'task_title', 'content', 'media_manifest', 'lesson']
 
 """
 * PaidTaskSerializer -> The serializer used to serialize and deserialize the PaidTask model
@@ -70,12 +94,13 @@ class FreeTaskSerializer(serializers.ModelSerializer):
 *   id (integer) -> The primary key for the task
 *   taskTitle (Char field) -> The name of the task that is being serialized
 *   content (JSON) -> The content of the task in JSON format
+*   media_manifest (JSON) -> The content type, byte size and reachability of each media link in the content
 *   lesson (Foreign Key Reference) -> The reference to the lesson to which the task instance belongs
 """
-class PaidTaskSerializer(serializers.ModelSerializer):
+class PaidTaskSerializer(ProjectedModelSerializer):
     class Meta:
         model = PaidTask
-        fields = ['id', 'task_title', 'content', 'lesson']
+        fields = ['id', 'task_title', 'content', 'media_manifest', 'lesson']
 
 
 
@@ -144,11 +169,11 @@ class MarkCompletedFreeTaskSerializer(serializers.Serializer):
             # Get the number of tasks belonging to a specific lesson
             # Get all of the completed tasks beloning to the lesson and the user
             lesson_num_tasks = lesson.num_tasks
-            completed_tasks = UserCompletedFreeTasks.objects.filter(user=user, task__lesson=lesson)
+            completed_tasks = UserCompletedFreeTasks.objects.filter(user=user, task__lesson=lesson, task__is_removed=False)
 
             # If the number of completed tasks (from the lesson) matches the number of tasks belonging to the lesson
             # That means that all of the tasks in that lesson have been completed
-            if len(completed_tasks) == lesson_num_tasks:
+            if completed_tasks.count() == lesson_num_tasks:
                 try:
                     UserCompletedFreeLessons.objects.create(user=user, lesson=lesson)
                     newly_completed_lessons.append(lesson.id)
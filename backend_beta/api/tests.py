@@ -1,3 +1,222 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from authentication.models import CustomUser
+
+from .cache import etag_matches
+from .models import FreeLesson, PaidLesson, FreeTask, CatalogVersion
+
+# Each test class gets its own local memory cache, whatever CACHES is set to
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'api-tests'}}
+
+
+"""
+* bump_catalog_version -> Raises the catalog version of a tier the way database_main does at the end of an ingest
+*
+* INPUTS
+*   tier (String) -> 'free' or 'paid'
+*
+* ADDITIONAL
+* The cached version is dropped as well, as if CATALOG_VERSION_TIMEOUT had passed since the ingest
+"""
+def bump_catalog_version(tier):
+    catalog_version, _ = CatalogVersion.objects.get_or_create(tier=tier)
+    catalog_version.version += 1
+    catalog_version.save()
+    cache.delete(f"catalog:{tier}:version")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='cache@example.com', password='password', is_paying_user=True)
+        cls.lesson = FreeLesson.objects.create(lesson_title='Learning P Sounds')
+        FreeTask.objects.create(lesson=cls.lesson, task_title='Pat', content=[])
+        PaidLesson.objects.create(lesson_title='Paid Lesson')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get('/api/all-free-lessons/')
+
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/all-free-lessons/')
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+
+    def test_cache_is_kept_until_the_version_is_bumped(self):
+        self.client.get('/api/all-free-lessons/')
+        FreeLesson.objects.filter(id=self.lesson.id).update(lesson_title='Changed')
+
+        # The ingest has not bumped the version yet, so the cached response is still served
+        self.assertEqual(self.client.get('/api/all-free-lessons/').json()[0]['lesson_title'], 'Learning P Sounds')
+
+        bump_catalog_version('free')
+        self.assertEqual(self.client.get('/api/all-free-lessons/').json()[0]['lesson_title'], 'Changed')
+
+    def test_bump_only_invalidates_its_own_tier(self):
+        self.client.get('/api/all-free-lessons/')
+        self.client.get('/api/all-paid-lessons/')
+
+        bump_catalog_version('paid')
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/all-free-lessons/')
+        with self.assertNumQueries(2):
+            self.client.get('/api/all-paid-lessons/')
+
+    def test_query_string_is_part_of_the_key(self):
+        full = self.client.get('/api/all-free-lessons/')
+        projected = self.client.get('/api/all-free-lessons/?fields=id')
+
+        self.assertEqual(sorted(full.json()[0]), ['id', 'lesson_title', 'num_tasks'])
+        self.assertEqual(sorted(projected.json()[0]), ['id'])
+
+    def test_error_responses_are_not_cached(self):
+        missing_id = self.lesson.id + 100
+        self.assertEqual(self.client.get(f'/api/free-tasks-by-lesson/{missing_id}/').status_code, 404)
+
+        FreeLesson.objects.create(id=missing_id, lesson_title='Added Later')
+        self.assertEqual(self.client.get(f'/api/free-tasks-by-lesson/{missing_id}/').status_code, 200)
+
+
+class EtagMatchesTest(SimpleTestCase):
+    def test_missing_header(self):
+        self.assertFalse(etag_matches(None, '"free-1-abc"'))
+        self.assertFalse(etag_matches('', '"free-1-abc"'))
+
+    def test_exact_and_listed_etags(self):
+        self.assertTrue(etag_matches('"free-1-abc"', '"free-1-abc"'))
+        self.assertTrue(etag_matches('"free-0-abc", "free-1-abc"', '"free-1-abc"'))
+        self.assertFalse(etag_matches('"free-0-abc"', '"free-1-abc"'))
+
+    def test_wildcard(self):
+        self.assertTrue(etag_matches('*', '"free-1-abc"'))
+
+    def test_weak_etag_does_not_match(self):
+        self.assertFalse(etag_matches('W/"free-1-abc"', '"free-1-abc"'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogETagTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='etag@example.com', password='password')
+        FreeLesson.objects.create(lesson_title='Learning P Sounds')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_response_carries_etag(self):
+        response = self.client.get('/api/all-free-lessons/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['ETag'], r'^"free-0-[0-9a-f]{16}"$')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_matching_etag_answers_304(self):
+        etag = self.client.get('/api/all-free-lessons/')['ETag']
+
+        # The version is cached by the first request, so the 304 needs no query
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/all-free-lessons/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_of_another_request_answers_200(self):
+        etag = self.client.get('/api/all-free-lessons/')['ETag']
+        response = self.client.get('/api/all-free-lessons/?fields=id', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_after_version_bump(self):
+        etag = self.client.get('/api/all-free-lessons/')['ETag']
+
+        bump_catalog_version('free')
+        response = self.client.get('/api/all-free-lessons/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['ETag'], r'^"free-1-')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_error_responses_have_no_etag(self):
+        response = self.client.get('/api/free-tasks-by-lesson/999999/')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogChangesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='changes@example.com', password='password')
+        cls.old_lesson = FreeLesson.objects.create(lesson_title='Learning P Sounds', catalog_version=1)
+        cls.new_lesson = FreeLesson.objects.create(lesson_title='Learning B Sounds', catalog_version=2)
+
+        cls.old_task = FreeTask.objects.create(lesson=cls.old_lesson, task_title='Pat', content=[], catalog_version=1)
+        cls.new_task = FreeTask.objects.create(lesson=cls.new_lesson, task_title='Bat', content=[], catalog_version=2)
+        cls.removed_task = FreeTask.objects.create(lesson=cls.old_lesson, task_title='Pit', content=[], catalog_version=2, is_removed=True)
+        CatalogVersion.objects.create(tier='free', version=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_since_zero_returns_whole_catalog(self):
+        for url in ('/api/free-changes/', '/api/free-changes/?since=0'):
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+
+                self.assertEqual(data['version'], 2)
+                self.assertEqual([lesson['id'] for lesson in data['lessons']], [self.old_lesson.id, self.new_lesson.id])
+                self.assertEqual([task['id'] for task in data['tasks']], [self.old_task.id, self.new_task.id])
+                self.assertEqual(data['removed_tasks'], [self.removed_task.id])
+
+    def test_since_only_returns_later_changes(self):
+        data = self.client.get('/api/free-changes/?since=1').json()
+
+        self.assertEqual(data['since'], 1)
+        self.assertEqual([lesson['id'] for lesson in data['lessons']], [self.new_lesson.id])
+        self.assertEqual([task['id'] for task in data['tasks']], [self.new_task.id])
+        self.assertEqual(data['removed_tasks'], [self.removed_task.id])
+
+    def test_since_current_version_returns_nothing(self):
+        data = self.client.get('/api/free-changes/?since=2').json()
+
+        self.assertEqual((data['lessons'], data['tasks'], data['removed_tasks'], data['next']), ([], [], [], None))
+
+    def test_non_integer_since_answers_400(self):
+        for since in ('abc', '1.5', ''):
+            with self.subTest(since=since):
+                response = self.client.get('/api/free-changes/', {'since': since})
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': "since must be a catalog version number"})
+                self.assertFalse(response.has_header('ETag'))
+
+    def test_task_changes_are_paged(self):
+        pages = [self.client.get('/api/free-changes/?since=0&page_size=2').json()]
+        while pages[-1]['next'] != None:
+            pages.append(self.client.get(pages[-1]['next']).json())
+
+        self.assertEqual(len(pages), 2)
+        self.assertEqual([task['id'] for task in pages[0]['tasks']], [self.old_task.id, self.new_task.id])
+        self.assertEqual(pages[0]['removed_tasks'], [])
+        self.assertEqual(pages[1]['removed_tasks'], [self.removed_task.id])
+
+        # The lessons are only sent with the first page
+        self.assertEqual(len(pages[0]['lessons']), 2)
+        self.assertEqual(pages[1]['lessons'], [])
@@ -14,6 +14,14 @@ urlpatterns = [
     path('free-tasks-by-lesson/<int:lesson_id>/', views.QueryFreeTaskByLesson.as_view(), name='free tasks by lesson'),
     path('paid-tasks-by-lesson/<int:lesson_id>/', views.QueryPaidTaskByLesson.as_view(), name='paid tasks by lesson'),
 
+    # Routes to fetch what changed in the free and paid catalogs since a catalog version (?since=<version>)
+    path('free-changes/', views.FreeCatalogChangesView.as_view(), name='free catalog changes'),
+    path('paid-changes/', views.PaidCatalogChangesView.as_view(), name='paid catalog changes'),
+
+    # Routes to fetch the precompressed catalog bundles written by the ingest (start with catalog.json)
+    path('free-catalog/<path:bundle_path>', views.FreeCatalogBundleView.as_view(), name='free catalog bundle'),
+    path('paid-catalog/<path:bundle_path>', views.PaidCatalogBundleView.as_view(), name='paid catalog bundle'),
+
     # Routes to fetch all of the tasks and lessons completed by a specific user
     path('free-completed-tasks/<str:email>/', views.GetUserFreeTaskCompleteView.as_view(), name='get completed free tasks'),
     path('free-completed-lessons/<str:email>/', views.GetUserFreeLessonCompleteView.as_view(), name='get completed free lessons'),
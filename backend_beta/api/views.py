@@ -1,10 +1,18 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from django.conf import settings
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
 
+from pathlib import Path
+
 from .permissions import IsPayingUser
+from .pagination import TaskCursorPagination
+from .cache import CatalogCacheMixin, get_catalog_version
+from .projection import FieldProjectionMixin
 from .models import FreeLesson, PaidLesson, FreeTask, PaidTask, UserCompletedFreeTasks, UserCompletedFreeLessons
 from .serializers import FreeLessonSerializer, PaidLessonSerializer, FreeTaskSerializer, PaidTaskSerializer, MarkCompletedFreeTaskSerializer, GetCompletedTaskSerializer, CompletedFreeLessonSerializer
 
@@ -19,11 +27,14 @@ from authentication.models import CustomUser
 *   queryset -> This gets all of the user instances from the FreeLesson table in the database
 *   serializer_class -> This specifies that the FreeLessonSerializer should be used to serialize and deserialize database object instances
 *   permissions_classes -> This should be AllowAny since any user should be able to register
+*   catalog_tier -> The responses are cached under the version of the free catalog (see CatalogCacheMixin)
+*   ?fields= -> A client can ask for only some of the fields, e.g. ?fields=id,lesson_title (see FieldProjectionMixin)
 * 
 * ADDITIONAL
 * Since this is a ListAPIView, that means that the route allows GET requests in order to retrieve objects from the database
 """
-class QueryAllFreeLessonsView(generics.ListAPIView):
+class QueryAllFreeLessonsView(CatalogCacheMixin, FieldProjectionMixin, generics.ListAPIView):
+    catalog_tier = 'free'
     queryset = FreeLesson.objects.all()
     serializer_class = FreeLessonSerializer
     permission_classes = [IsAuthenticated]
@@ -35,11 +46,14 @@ class QueryAllFreeLessonsView(generics.ListAPIView):
 *   queryset -> This gets all of the user instances from the PaidLesson table in the database
 *   serializer_class -> This specifies that the PaidLessonSerializer should be used to serialize and deserialize database object instances
 *   permissions_classes -> This should be AllowAny since any user should be able to register
+*   catalog_tier -> The responses are cached under the version of the paid catalog (see CatalogCacheMixin)
+*   ?fields= -> A client can ask for only some of the fields, e.g. ?fields=id,lesson_title (see FieldProjectionMixin)
 * 
 * ADDITIONAL
 * Since this is a ListAPIView, that means that the route allows GET requests in order to retrieve objects from the database
 """
-class QueryAllPaidLessonsView(generics.ListAPIView):
+class QueryAllPaidLessonsView(CatalogCacheMixin, FieldProjectionMixin, generics.ListAPIView):
+    catalog_tier = 'paid'
     queryset = PaidLesson.objects.all()
     serializer_class = PaidLessonSerializer
     permission_classes = [IsAuthenticated, IsPayingUser]
@@ -51,54 +65,67 @@ class QueryAllPaidLessonsView(generics.ListAPIView):
 * QueryAllFreeTasksView -> This is a aview that is used to query all of the free tasks from the database
 * 
 * FIELDS
-*   queryset -> This gets all of the user instances from the FreeTask table in the database
+*   queryset -> This gets all of the user instances from the FreeTask table in the database, leaving out the tasks flagged as removed
 *   serializer_class -> This specifies that the FreeTaskSerializer should be used to serialize and deserialize database object instances
 *   permissions_classes -> This should be AllowAny since any user should be able to register
+*   catalog_tier -> The responses are cached under the version of the free catalog (see CatalogCacheMixin)
+*   pagination_class -> The tasks are sent a page at a time, ordered by id (see TaskCursorPagination)
+*   ?fields= -> A client can ask for only some of the fields, e.g. ?fields=id,task_title leaves the content unread (see FieldProjectionMixin)
 * 
 * ADDITIONAL
 * Since this is a ListAPIView, that means that the route allows GET requests in order to retrieve objects from the database 
 """
-class QueryAllFreeTasksView(generics.ListAPIView):
-    queryset = FreeTask.objects.all()
+class QueryAllFreeTasksView(CatalogCacheMixin, FieldProjectionMixin, generics.ListAPIView):
+    catalog_tier = 'free'
+    queryset = FreeTask.objects.filter(is_removed=False)
     serializer_class = FreeTaskSerializer
+    pagination_class = TaskCursorPagination
     permission_classes = [IsAuthenticated]
 
 """
 * QueryAllPaidTasksView -> This is a aview that is used to query all of the paid tasks from the database
 * 
 * FIELDS
-*   queryset -> This gets all of the user instances from the PaidTask table in the database
+*   queryset -> This gets all of the user instances from the PaidTask table in the database, leaving out the tasks flagged as removed
 *   serializer_class -> This specifies that the PaidTaskSerializer should be used to serialize and deserialize database object instances
 *   permissions_classes -> This should be AllowAny since any user should be able to register
+*   catalog_tier -> The responses are cached under the version of the paid catalog (see CatalogCacheMixin)
+*   pagination_class -> The tasks are sent a page at a time, ordered by id (see TaskCursorPagination)
+*   ?fields= -> A client can ask for only some of the fields, e.g. ?fields=id,task_title leaves the content unread (see FieldProjectionMixin)
 * 
 * ADDITIONAL
 * Since this is a ListAPIView, that means that the route allows GET requests in order to retrieve objects from the database 
 """
-class QueryAllPaidTasksView(generics.ListAPIView):
-    queryset = PaidTask.objects.all()
+class QueryAllPaidTasksView(CatalogCacheMixin, FieldProjectionMixin, generics.ListAPIView):
+    catalog_tier = 'paid'
+    queryset = PaidTask.objects.filter(is_removed=False)
     serializer_class = PaidTaskSerializer
+    pagination_class = TaskCursorPagination
     permission_classes = [IsAuthenticated, IsPayingUser]
 
 """
 * QueryFreeTaskByLesson -> This view is used to query free tasks that belong to a specific lesson
 * 
 * FIELDS 
-*   queryset -> This gets all of the user instances from the FreeTask table in the database
+*   queryset -> This gets all of the user instances from the FreeTask table in the database, leaving out the tasks flagged as removed
 *   serializer_class -> This specifies that the FreeTaskSerializer should be used to serialize and deserialize database object instances
 *   permissions_classes -> This should be AllowAny since any user should be able to register
+*   catalog_tier -> The responses are cached under the version of the free catalog (see CatalogCacheMixin)
 *   get_queryset -> Since we don't want to retrieve all elements from the table, we need to specify the how to filter out the objects we do want
+*   ?fields= -> A client can ask for only some of the fields, e.g. ?fields=id,task_title leaves the content unread (see FieldProjectionMixin)
 * 
 * ADDITIONAL
 * Since this is a ListAPIView, that means that the route allows GET requests in order to retrieve objects from the database 
 """
-class QueryFreeTaskByLesson(generics.ListAPIView):
+class QueryFreeTaskByLesson(CatalogCacheMixin, FieldProjectionMixin, generics.ListAPIView):
+    catalog_tier = 'free'
     serializer_class = FreeTaskSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         lesson_id = self.kwargs.get('lesson_id')
         lesson = get_object_or_404(FreeLesson, id=lesson_id)
-        return FreeTask.objects.filter(lesson=lesson)
+        return FreeTask.objects.filter(lesson=lesson, is_removed=False)
 
 """
 * QueryPaidTaskByLesson -> This view is used to query paid tasks that belong to a specific lesson
@@ -106,20 +133,202 @@ class QueryFreeTaskByLesson(generics.ListAPIView):
 * FIELDS 
 *   serializer_class -> This specifies that the PaidTaskSerializer should be used to serialize and deserialize database object instances
 *   permissions_classes -> This should be AllowAny since any user should be able to register
+*   catalog_tier -> The responses are cached under the version of the paid catalog (see CatalogCacheMixin)
 *   get_queryset -> Since we don't want to retrieve all elements from the table, we need to specify the how to filter out the objects we do want
 *       We want to filter based on which tasks belong to the lesson with the specified name
+*   ?fields= -> A client can ask for only some of the fields, e.g. ?fields=id,task_title leaves the content unread (see FieldProjectionMixin)
 * 
 * ADDITIONAL
 * Since this is a ListAPIView, that means that the route allows GET requests in order to retrieve objects from the database 
 """
-class QueryPaidTaskByLesson(generics.ListAPIView):
+class QueryPaidTaskByLesson(CatalogCacheMixin, FieldProjectionMixin, generics.ListAPIView):
+    catalog_tier = 'paid'
     serializer_class = PaidTaskSerializer
     permission_classes = [IsAuthenticated, IsPayingUser]
 
     def get_queryset(self):
         lesson_id = self.kwargs.get('lesson_id')
         lesson = get_object_or_404(PaidLesson, id=lesson_id)
-        return PaidTask.objects.filter(lesson=lesson)
+        return PaidTask.objects.filter(lesson=lesson, is_removed=False)
+
+
+
+# ***** CATALOG CHANGES VIEWS *****
+"""
+* CatalogChangesView -> This is the base view that tells a client what changed in a catalog since the version it last synced
+*
+* FIELDS
+*   lesson_model, task_model -> The lesson and task models of the tier
+*   lesson_serializer_class, task_serializer_class -> The serializers used for the changed lessons and tasks
+*   pagination_class -> The changed tasks are sent a page at a time, ordered by id (see TaskCursorPagination)
+*   get() -> Reads ?since=<catalog version> and returns the changes after it. 0 (or no since) returns the whole catalog, removed tasks included
+*
+* ADDITIONAL
+* The response holds the current catalog version, the lessons and tasks that were inserted or changed after 'since', and the ids
+* of the tasks that were removed from the website after it. The client follows 'next' until it is null, then stores 'version'
+* and sends it as 'since' next time. The changed lessons are few and only sent with the first page.
+* Every row changed by an ingest is stamped with the version that ingest produces, and catalog_version is indexed,
+* so a refresh only reads the rows that changed
+"""
+class CatalogChangesView(generics.GenericAPIView):
+    lesson_model = None
+    task_model = None
+    lesson_serializer_class = None
+    task_serializer_class = None
+    pagination_class = TaskCursorPagination
+
+    def get(self, request):
+        return self.list(request)
+
+    def list(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            return Response({'error': "since must be a catalog version number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        changed_lessons = self.lesson_model.objects.order_by('id')
+        changed_tasks = self.task_model.objects.order_by('id')
+
+        # Rows that no ingest has touched since the column was added are still at version 0, so a first sync takes every row
+        if since > 0:
+            changed_lessons = changed_lessons.filter(catalog_version__gt=since)
+            changed_tasks = changed_tasks.filter(catalog_version__gt=since)
+
+        # The removed tasks are paged together with the others, so a first sync never reads the whole catalog at once
+        page = self.paginate_queryset(changed_tasks)
+        if self.paginator.has_previous:
+            changed_lessons = changed_lessons.none()
+
+        return Response({
+            'version': get_catalog_version(self.catalog_tier),
+            'since': since,
+            'lessons': self.lesson_serializer_class(changed_lessons, many=True).data,
+            'tasks': self.task_serializer_class([task for task in page if not task.is_removed], many=True).data,
+            'removed_tasks': [task.id for task in page if task.is_removed],
+            'next': self.paginator.get_next_link(),
+            'previous': self.paginator.get_previous_link(),
+        }, status=status.HTTP_200_OK)
+
+"""
+* FreeCatalogChangesView -> This is a view that is used to sync the changes to the free lessons and tasks
+*
+* FIELDS
+*   catalog_tier -> The responses are cached under the version of the free catalog (see CatalogCacheMixin)
+*   permissions_classes -> This should be IsAuthenticated so that only logged in users can read the catalog
+"""
+class FreeCatalogChangesView(CatalogCacheMixin, CatalogChangesView):
+    catalog_tier = 'free'
+    lesson_model = FreeLesson
+    task_model = FreeTask
+    lesson_serializer_class = FreeLessonSerializer
+    task_serializer_class = FreeTaskSerializer
+    permission_classes = [IsAuthenticated]
+
+"""
+* PaidCatalogChangesView -> This is a view that is used to sync the changes to the paid lessons and tasks
+*
+* FIELDS
+*   catalog_tier -> The responses are cached under the version of the paid catalog (see CatalogCacheMixin)
+*   permissions_classes -> This should be IsAuthenticated and IsPayingUser so that only paying users can read the paid catalog
+"""
+class PaidCatalogChangesView(CatalogCacheMixin, CatalogChangesView):
+    catalog_tier = 'paid'
+    lesson_model = PaidLesson
+    task_model = PaidTask
+    lesson_serializer_class = PaidLessonSerializer
+    task_serializer_class = PaidTaskSerializer
+    permission_classes = [IsAuthenticated, IsPayingUser]
+
+
+
+# ***** CATALOG BUNDLE VIEWS *****
+"""
+* accepted_encodings -> Reads the content encodings that a client accepts from its Accept-Encoding header
+*
+* INPUTS
+*   header (String) -> The Accept-Encoding header
+*
+* OUTPUTS
+*   encodings (set) -> The accepted encodings. Encodings refused with q=0 are left out
+"""
+def accepted_encodings(header):
+    encodings = set()
+    for token in header.split(','):
+        name, _, params = token.partition(';')
+        params = params.replace(' ', '')
+        if params in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        encodings.add(name.strip().lower())
+
+    return encodings
+
+
+"""
+* CatalogBundleView -> This is the base view that serves the files written to CATALOG_BUNDLE_ROOT by the ingest
+*
+* FIELDS
+*   tier -> The directory of the tier inside CATALOG_BUNDLE_ROOT ('free' or 'paid')
+*   get() -> Sends the requested file, picking its brotli or gzip copy if the client accepts it
+*
+* ADDITIONAL
+* The files are sent as they are, so a catalog read never touches the database or a serializer.
+* catalog.json has to be revalidated on every read, while every other file carries its version in its name and can be cached for good
+"""
+class CatalogBundleView(APIView):
+    tier = None
+    encodings = (('br', '.br'), ('gzip', '.gz'))
+
+    def get(self, request, bundle_path):
+        tier_dir = (Path(settings.CATALOG_BUNDLE_ROOT) / self.tier).resolve()
+        path = (tier_dir / bundle_path).resolve()
+
+        # Only hand out the JSON files inside the directory of the tier
+        if not path.is_relative_to(tier_dir) or path.suffix != '.json' or not path.is_file():
+            raise Http404
+
+        send_path = path
+        content_encoding = None
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        for encoding, suffix in self.encodings:
+            compressed_path = path.with_name(path.name + suffix)
+            if encoding in accepted and compressed_path.is_file():
+                send_path = compressed_path
+                content_encoding = encoding
+                break
+
+        response = FileResponse(open(send_path, 'rb'), content_type='application/json')
+        if content_encoding != None:
+            response['Content-Encoding'] = content_encoding
+        response['Vary'] = 'Accept-Encoding'
+
+        if path.name == 'catalog.json':
+            response['Cache-Control'] = 'private, no-cache'
+        else:
+            response['Cache-Control'] = 'private, max-age=31536000, immutable'
+
+        return response
+
+"""
+* FreeCatalogBundleView -> This is a view that is used to fetch the catalog bundles of the free lessons
+*
+* FIELDS
+*   tier -> The free bundles are read from CATALOG_BUNDLE_ROOT/free
+*   permissions_classes -> This should be IsAuthenticated so that only logged in users can read the catalog
+"""
+class FreeCatalogBundleView(CatalogBundleView):
+    tier = 'free'
+    permission_classes = [IsAuthenticated]
+
+"""
+* PaidCatalogBundleView -> This is a view that is used to fetch the catalog bundles of the paid lessons
+*
+* FIELDS
+*   tier -> The paid bundles are read from CATALOG_BUNDLE_ROOT/paid
+*   permissions_classes -> This should be IsAuthenticated and IsPayingUser so that only paying users can read the paid catalog
+"""
+class PaidCatalogBundleView(CatalogBundleView):
+    tier = 'paid'
+    permission_classes = [IsAuthenticated, IsPayingUser]
 
 
 
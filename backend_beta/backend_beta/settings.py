@@ -44,6 +44,31 @@ REST_FRAMEWORK = {
     ],
 }
 
+# The cache that holds the catalog responses (see api/cache.py)
+# -> every process keeps its own copy with the default local memory cache. Set REDIS_URL to share one cache between processes
+if getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'catalog',
+        }
+    }
+
+# How long (in seconds) a cached catalog response and the cached catalog version are kept
+CATALOG_CACHE_TIMEOUT = int(getenv('CATALOG_CACHE_TIMEOUT', 60 * 60 * 24))
+CATALOG_VERSION_TIMEOUT = int(getenv('CATALOG_VERSION_TIMEOUT', 5))
+
+# The number of tasks per page of the all-free-tasks and all-paid-tasks routes (see api/pagination.py)
+TASK_PAGE_SIZE = int(getenv('TASK_PAGE_SIZE', 100))
+TASK_MAX_PAGE_SIZE = int(getenv('TASK_MAX_PAGE_SIZE', 500))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
@@ -155,10 +180,17 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# The directory holding the precompressed catalog bundles written by the ingest (database_main --bundle-dir)
+# -> it holds a free/ and a paid/ directory, each with a catalog.json
+CATALOG_BUNDLE_ROOT = getenv('CATALOG_BUNDLE_ROOT', os.path.join(BASE_DIR, 'catalog_bundles'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True
-CORS_ALLOWS_CREDENTIALS = True
\ No newline at end of file
+CORS_ALLOWS_CREDENTIALS = True
+
+# Lets browser clients read the ETag of the catalog responses so that they can send it back in If-None-Match
+CORS_EXPOSE_HEADERS = ['ETag']
\ No newline at end of file
@@ -0,0 +1,302 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values, Json
+
+from database_beta.config import load_config
+from database_beta import insertion_functions
+from scraping_beta.benchmark_main import print_results
+
+# The insertion strategies that are compared
+STRATEGIES = ('execute', 'executemany', 'execute_values', 'copy')
+
+# The content types that the synthetic tasks are made of
+SYNTHETIC_TYPES = ('paragraph', 'audio', 'image', 'video')
+
+
+"""
+* generate_dataset : This function builds a synthetic set of lessons and tasks shaped like the scraped ones
+*
+* INPUTS
+* num_lessons (int) : The number of lessons
+* tasks_per_lesson (int) : The number of tasks in every lesson
+* Optional items_per_task (int) : The number of content objects in every task
+* Optional seed (int) : Seed of the random generator, so that every run loads the same data
+*
+* OUTPUTS
+* lesson_titles (list[String]) : The titles of the lessons
+* tasks (list[tuple]) : (lesson_title, task_title, content, media_manifest) tuples, as handed to insertion_functions.ingest_tasks
+"""
+def generate_dataset(num_lessons, tasks_per_lesson, items_per_task=6, seed=0):
+    rand = random.Random(seed)
+    lesson_titles = [f"Synthetic Lesson {i}" for i in range(num_lessons)]
+    tasks = []
+
+    for lesson_title in lesson_titles:
+        for i in range(tasks_per_lesson):
+            content = []
+            media_manifest = {}
+
+            for _ in range(items_per_task):
+                content_type = rand.choice(SYNTHETIC_TYPES)
+                if content_type == 'paragraph':
+                    words = rand.randint(5, 40)
+                    content.append({'type' : 'paragraph', 'content' : " ".join(f"word{rand.randint(0, 999)}" for _ in range(words))})
+                else:
+                    url = f"https://www.speechmodification.com/uploads/{rand.getrandbits(48):x}.{content_type}"
+                    content.append({'type' : content_type, 'content' : url})
+                    media_manifest[url] = {'content_type' : f"{content_type}/x", 'size' : rand.randint(1000, 10 ** 6), 'status' : 200, 'reachable' : True}
+
+            tasks.append((lesson_title, f"{lesson_title} Task {i}", content, media_manifest))
+
+    return lesson_titles, tasks
+
+
+"""
+* create_schema : This function creates a throwaway schema holding copies of the lesson and task tables
+*
+* INPUTS
+* conn : A database connection object
+* schema (String) : The name of the schema
+*
+* OUTPUTS
+* None
+*
+* ADDITIONAL
+* The tables carry the same names, columns and constraints as the Django tables, and the connection's search_path
+* is pointed at the schema. The insertion functions therefore run unchanged without touching the real tables
+"""
+def create_schema(conn, schema):
+    cur = conn.cursor()
+
+    cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
+    cur.execute(f"CREATE SCHEMA {schema};")
+    cur.execute(f"SET search_path TO {schema};")
+
+    for tier in ('free', 'paid'):
+        cur.execute(f"""
+        CREATE TABLE api_{tier}lesson (
+            id bigserial PRIMARY KEY,
+            lesson_title varchar(255) NOT NULL UNIQUE,
+            num_tasks integer NOT NULL DEFAULT 0,
+            updated_at timestamptz NOT NULL DEFAULT now(),
+            catalog_version bigint NOT NULL DEFAULT 0
+        );
+        CREATE TABLE api_{tier}task (
+            id bigserial PRIMARY KEY,
+            task_title varchar NOT NULL,
+            content jsonb NOT NULL,
+            media_manifest jsonb,
+            content_hash varchar(64) NOT NULL DEFAULT '',
+            is_removed boolean NOT NULL DEFAULT false,
+            updated_at timestamptz NOT NULL DEFAULT now(),
+            catalog_version bigint NOT NULL DEFAULT 0,
+            lesson_id bigint NOT NULL REFERENCES api_{tier}lesson (id) ON DELETE CASCADE,
+            UNIQUE (lesson_id, task_title)
+        );
+        CREATE INDEX ON api_{tier}task (lesson_id);
+        """)
+
+    conn.commit()
+    cur.close()
+
+
+"""
+* drop_schema : This function removes the throwaway schema and everything in it
+*
+* INPUTS
+* conn : A database connection object
+* schema (String) : The name of the schema
+*
+* OUTPUTS
+* None
+"""
+def drop_schema(conn, schema):
+    conn.rollback()
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
+    conn.commit()
+    cur.close()
+
+
+"""
+* reset_tables : This function empties the benchmark tables and inserts the lessons again
+*
+* INPUTS
+* conn : A database connection object
+* lesson_titles (list[String]) : The titles of the lessons
+*
+* OUTPUTS
+* lesson_ids (dict) : The id of every lesson, keyed by title
+"""
+def reset_tables(conn, lesson_titles):
+    cur = conn.cursor()
+    cur.execute("TRUNCATE api_freetask, api_freelesson RESTART IDENTITY;")
+    conn.commit()
+    cur.close()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return insertion_functions.insert_lesson(conn, [(title, 0) for title in lesson_titles], many=True)
+
+
+"""
+* write_batch : This function writes one batch of task rows with the given strategy and commits it
+*
+* INPUTS
+* conn : A database connection object
+* strategy (String) : One of STRATEGIES
+* rows (list[tuple]) : (lesson_id, task_title, content, media_manifest, content_hash) rows
+*
+* OUTPUTS
+* None
+*
+* ADDITIONAL
+* execute and copy are the real ingest paths (insert_task without and with bulk). executemany and execute_values
+* run the same upsert (insertion_functions.task_upsert_sql) and the same num_tasks recount, so only the way the rows reach the server differs
+"""
+def write_batch(conn, strategy, rows):
+    if strategy == 'execute':
+        insertion_functions.insert_task(conn, rows, many=True)
+        return
+
+    if strategy == 'copy':
+        insertion_functions.insert_task(conn, rows, many=True, bulk=True)
+        return
+
+    # The rows are adapted the way insert_task adapts them, without a catalog version
+    adapted = [(row[0], row[1], Json(row[2]), Json(row[3]) if row[3] != None else None, row[4], None) for row in rows]
+    cur = conn.cursor()
+
+    if strategy == 'executemany':
+        cur.executemany(insertion_functions.task_upsert_sql('api_freetask'), adapted)
+    elif strategy == 'execute_values':
+        execute_values(cur, insertion_functions.task_upsert_sql('api_freetask', "%s"), adapted, template=insertion_functions.TASK_UPSERT_TEMPLATE, page_size=len(adapted))
+    else:
+        raise ValueError(f"Unknown strategy '{strategy}'. Choose one of {', '.join(STRATEGIES)}")
+
+    insertion_functions.db_recount_tasks(cur, {row[0] for row in rows})
+    conn.commit()
+    cur.close()
+
+
+"""
+* benchmark_strategy : This function times loading the whole dataset with one strategy
+*
+* INPUTS
+* conn : A database connection object with its search_path on the benchmark schema
+* strategy (String) : One of STRATEGIES
+* lesson_titles (list[String]) : The titles of the lessons
+* tasks (list[tuple]) : The synthetic tasks
+* Optional batch_size (int) : The number of rows written and committed at a time
+* Optional repeat (int) : The number of rounds. The fastest round is reported
+*
+* OUTPUTS
+* result (dict) : The strategy, number of rows, batch size, wall time of the fastest round and rows per second
+*
+* ADDITIONAL
+* The tables are emptied before every round, so every round is a load into empty tables.
+* The hashes are computed before the clock starts because every strategy would pay the same for them
+"""
+def benchmark_strategy(conn, strategy, lesson_titles, tasks, batch_size=insertion_functions.DEFAULT_BATCH_SIZE, repeat=3):
+    timings = []
+
+    for _ in range(repeat):
+        lesson_ids = reset_tables(conn, lesson_titles)
+        rows = [
+            (lesson_ids[task[0]], task[1], task[2], task[3], insertion_functions.task_hash(task[2]))
+            for task in tasks
+        ]
+
+        # The insertion functions report every cursor they close, which is not part of the measurement
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for i in range(0, len(rows), batch_size):
+                write_batch(conn, strategy, rows[i:i + batch_size])
+            timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    return {
+        'strategy' : strategy,
+        'rows' : len(tasks),
+        'batch_size' : batch_size,
+        'seconds' : best,
+        'rows_per_sec' : len(tasks) / best if best > 0 else float('inf'),
+    }
+
+
+"""
+* check_loaded : This function makes sure that a strategy really wrote every row
+*
+* INPUTS
+* conn : A database connection object with its search_path on the benchmark schema
+* num_rows (int) : The number of tasks that should be in the table
+*
+* OUTPUTS
+* None
+"""
+def check_loaded(conn, num_rows):
+    cur = conn.cursor()
+    cur.execute("SELECT (SELECT count(*) FROM api_freetask), (SELECT coalesce(sum(num_tasks), 0) FROM api_freelesson);")
+    loaded, counted = cur.fetchone()
+    conn.commit()
+    cur.close()
+
+    if loaded != num_rows or counted != num_rows:
+        raise RuntimeError(f"Expected {num_rows} tasks but found {loaded} rows and num_tasks totalling {counted}")
+
+
+"""
+* run_benchmarks : This function loads a synthetic dataset through every strategy in a throwaway schema
+*
+* INPUTS
+* config (dict) : The connection parameters of the (local) PostgreSQL server
+* Optional num_lessons (int) : The number of lessons in the dataset
+* Optional tasks_per_lesson (int) : The number of tasks in every lesson
+* Optional batch_size (int) : The number of rows written and committed at a time
+* Optional repeat (int) : The number of rounds per strategy
+* Optional strategies (list[String]) : The strategies to compare
+*
+* OUTPUTS
+* results (list[dict]) : One result per strategy (see benchmark_strategy)
+"""
+def run_benchmarks(config, num_lessons=20, tasks_per_lesson=100, batch_size=insertion_functions.DEFAULT_BATCH_SIZE, repeat=3, strategies=STRATEGIES):
+    lesson_titles, tasks = generate_dataset(num_lessons, tasks_per_lesson)
+    schema = f"ingest_benchmark_{os.getpid()}"
+    results = []
+
+    conn = psycopg2.connect(**config)
+    try:
+        create_schema(conn, schema)
+
+        for strategy in strategies:
+            result = benchmark_strategy(conn, strategy, lesson_titles, tasks, batch_size, repeat)
+            check_loaded(conn, len(tasks))
+            results.append(result)
+
+    finally:
+        drop_schema(conn, schema)
+        conn.close()
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the task insertion strategies against a throwaway schema on a local PostgreSQL server")
+    parser.add_argument("--dsn", default=None, help="A libpq connection string. The [postgresql] section of database_beta/database.ini is used if not given")
+    parser.add_argument("--lessons", type=int, default=20, help="The number of synthetic lessons")
+    parser.add_argument("--tasks-per-lesson", type=int, default=100, help="The number of synthetic tasks in every lesson")
+    parser.add_argument("--batch-size", type=int, default=insertion_functions.DEFAULT_BATCH_SIZE, help="The number of rows written and committed at a time")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of rounds per strategy (the fastest is reported)")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=STRATEGIES, help="The strategies to compare")
+    args = parser.parse_args()
+
+    config = {'dsn' : args.dsn} if args.dsn != None else load_config()
+
+    results = run_benchmarks(config, args.lessons, args.tasks_per_lesson, args.batch_size, args.repeat, args.strategies)
+    print(f"Loading {results[0]['rows']} synthetic tasks" if len(results) > 0 else "No results")
+    print_results(results)
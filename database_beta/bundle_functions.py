@@ -0,0 +1,200 @@
+import gzip
+import hashlib
+import json
+import os
+
+from database_beta import query_functions
+
+# brotli is optional (pip install brotli). Without it only the gzip copies are written and build_bundles says so
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# The name of the catalog index in the directory of each tier
+# -> every other file carries its version in its name and never changes once written
+CATALOG_FILE = "catalog.json"
+
+# The number of hex digits of the content hash that are used as the version of a file
+VERSION_LENGTH = 16
+
+
+"""
+* encode_bundle : Turns a bundle into compact JSON bytes
+*
+* INPUTS
+* bundle (list or dict) : The data of the bundle
+*
+* OUTPUTS
+* data (bytes) : The UTF-8 JSON of the bundle. The same data always gives the same bytes
+"""
+def encode_bundle(bundle):
+    return json.dumps(bundle, separators=(',', ':'), ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+
+"""
+* write_file : Writes bytes to a file through a temporary file so that readers never see a half written file
+*
+* INPUTS
+* path (String) : The path of the file
+* data (bytes) : The bytes to be written
+*
+* OUTPUTS
+* None
+"""
+def write_file(path, data):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as temp_file:
+        temp_file.write(data)
+    os.replace(temp_path, path)
+
+
+"""
+* write_versioned : Writes a bundle under a name holding its content hash, along with its precompressed copies
+*
+* INPUTS
+* directory (String) : The directory of the file
+* name (String) : The start of the file name
+* data (bytes) : The JSON bytes of the bundle
+*
+* OUTPUTS
+* file_name (String) : The name of the JSON file -> <name>.<version>.json, with .gz and .br copies next to it
+*
+* ADDITIONAL
+* A bundle that has not changed keeps its name and is not written again
+"""
+def write_versioned(directory, name, data):
+    version = hashlib.sha256(data).hexdigest()[:VERSION_LENGTH]
+    file_name = f"{name}.{version}.json"
+    path = os.path.join(directory, file_name)
+
+    if not os.path.exists(path):
+        # mtime=0 keeps the gzip bytes the same between runs
+        write_file(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli != None:
+            write_file(path + ".br", brotli.compress(data, quality=11))
+        write_file(path, data)
+
+    return file_name
+
+
+"""
+* bundle_files : Lists the files that belong to a catalog index, compressed copies included
+*
+* INPUTS
+* tier_dir (String) : The bundle directory of the tier
+*
+* OUTPUTS
+* files (set[String]) : The paths, relative to tier_dir, of every file the catalog points at (empty if there is no catalog)
+"""
+def bundle_files(tier_dir):
+    try:
+        with open(os.path.join(tier_dir, CATALOG_FILE), encoding="utf-8") as catalog_file:
+            catalog = json.load(catalog_file)
+    except (OSError, ValueError):
+        return set()
+
+    files = set()
+    for file_name in [catalog['index']] + [lesson['bundle'] for lesson in catalog['lessons']]:
+        files.update((file_name, file_name + ".gz", file_name + ".br"))
+
+    return files
+
+
+"""
+* prune_bundles : Removes the bundle files that neither the current nor the previous catalog points at
+*
+* INPUTS
+* tier_dir (String) : The bundle directory of the tier
+* keep (set[String]) : The files to keep, relative to tier_dir
+*
+* OUTPUTS
+* None
+*
+* ADDITIONAL
+* The files of the previous catalog are kept so that a client still holding it does not get a 404
+"""
+def prune_bundles(tier_dir, keep):
+    for directory, _, file_names in os.walk(tier_dir):
+        for file_name in file_names:
+            relative_path = os.path.relpath(os.path.join(directory, file_name), tier_dir).replace(os.sep, "/")
+            if relative_path != CATALOG_FILE and relative_path not in keep:
+                os.remove(os.path.join(directory, file_name))
+
+
+"""
+* build_bundles : Writes the static catalog bundles of a tier from the database
+*
+* INPUTS
+* conn : A database connection object
+* bundle_dir (String) : The root directory of the bundles. The tier is written to <bundle_dir>/free or <bundle_dir>/paid
+* Optional paid (bool) : Specifies whether the paid lessons are bundled
+*
+* OUTPUTS
+* catalog (dict) : The catalog index that was written
+*
+* ADDITIONAL
+* Every lesson gets lessons/<lesson_id>.<version>.json holding its active tasks, in the same shape as the
+* tasks-by-lesson route. index.<version>.json holds the lessons in the shape of the all-lessons route.
+* catalog.json is written last and points at the current version of every file, so a reader always sees a complete set.
+* The versioned files never change, so they can be served with a long cache lifetime. Any static file server that
+* picks up .gz/.br copies (nginx gzip_static/brotli_static, whitenoise) can serve the directory directly.
+* The .br copies are only written when the brotli package is installed
+"""
+def build_bundles(conn, bundle_dir, paid=False):
+    if brotli == None:
+        print("Warning: the brotli package is not installed, so no .br bundles are written (pip install brotli)")
+
+    tier_dir = os.path.join(bundle_dir, 'paid' if paid else 'free')
+    lesson_dir = os.path.join(tier_dir, 'lessons')
+    os.makedirs(lesson_dir, exist_ok=True)
+
+    previous_files = bundle_files(tier_dir)
+
+    # The tasks are streamed in lesson order, so only one lesson is held in memory at a time
+    lessons = list(query_functions.iter_lessons(conn, paid))
+    lesson_bundles = {}
+
+    current_lesson_id = None
+    current_tasks = []
+    tasks = query_functions.db_stream(conn, f"""
+    SELECT id, task_title, content, media_manifest, lesson_id
+    FROM {query_functions.tier_tables(paid)[0]}
+    WHERE NOT is_removed
+    ORDER BY lesson_id, id;
+    """)
+
+    for task_id, task_title, content, media_manifest, lesson_id in tasks:
+        if lesson_id != current_lesson_id and current_lesson_id != None:
+            lesson_bundles[current_lesson_id] = write_versioned(lesson_dir, str(current_lesson_id), encode_bundle(current_tasks))
+            current_tasks = []
+
+        current_lesson_id = lesson_id
+        current_tasks.append({'id' : task_id, 'task_title' : task_title, 'content' : content, 'media_manifest' : media_manifest, 'lesson' : lesson_id})
+
+    if current_lesson_id != None:
+        lesson_bundles[current_lesson_id] = write_versioned(lesson_dir, str(current_lesson_id), encode_bundle(current_tasks))
+
+    # Lessons without any active tasks still get an (empty) bundle
+    for lesson_id, _, _ in lessons:
+        if lesson_id not in lesson_bundles:
+            lesson_bundles[lesson_id] = write_versioned(lesson_dir, str(lesson_id), encode_bundle([]))
+
+    index = [{'id' : lesson_id, 'lesson_title' : lesson_title, 'num_tasks' : num_tasks} for lesson_id, lesson_title, num_tasks in lessons]
+    index_file = write_versioned(tier_dir, "index", encode_bundle(index))
+
+    catalog = {
+        'index' : index_file,
+        'lessons' : [{'id' : lesson_id, 'bundle' : f"lessons/{lesson_bundles[lesson_id]}"} for lesson_id, _, _ in lessons],
+    }
+    catalog['version'] = hashlib.sha256(encode_bundle(catalog)).hexdigest()[:VERSION_LENGTH]
+
+    catalog_data = encode_bundle(catalog)
+    write_file(os.path.join(tier_dir, CATALOG_FILE) + ".gz", gzip.compress(catalog_data, compresslevel=9, mtime=0))
+    if brotli != None:
+        write_file(os.path.join(tier_dir, CATALOG_FILE) + ".br", brotli.compress(catalog_data, quality=11))
+    write_file(os.path.join(tier_dir, CATALOG_FILE), catalog_data)
+
+    prune_bundles(tier_dir, previous_files | bundle_files(tier_dir) | {CATALOG_FILE + ".gz", CATALOG_FILE + ".br"})
+
+    return catalog
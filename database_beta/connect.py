@@ -1,30 +1,108 @@
 import psycopg2
 from psycopg2 import pool
+from psycopg2 import extensions
+from contextlib import contextmanager
+
+# The default number of connections kept open by a pool
+# -> one writer per tier (free and paid) needs two connections at most
+DEFAULT_MIN_CONNECTIONS = 1
+DEFAULT_MAX_CONNECTIONS = 4
+
+# The number of times a broken connection is replaced before giving up on a checkout
+CHECKOUT_ATTEMPTS = 3
 
 def connect_one(config):
     """ Connect to the PostgreSQL database server """
 
     try:
         # connecting to the PostgreSQL server
-        with psycopg2.connect(**config) as conn:
-            print('Connected to the PostgreSQL server.')
-            return conn
-        
+        conn = psycopg2.connect(**config)
+        print('Connected to the PostgreSQL server.')
+        return conn
+
     except (psycopg2.DatabaseError, Exception) as error:
         print("Error:", error)
 
 
-def connect_pool(config):
-    """ Connect to the PostgreSQL database server """
-    
+def create_pool(config, minconn=DEFAULT_MIN_CONNECTIONS, maxconn=DEFAULT_MAX_CONNECTIONS):
+    """ Create a thread-safe pool of connections to the PostgreSQL database server """
+
+    if minconn < 0 or maxconn < max(minconn, 1):
+        raise ValueError(f"Invalid pool size (minconn={minconn}, maxconn={maxconn})")
+
+    return pool.ThreadedConnectionPool(minconn, maxconn, **config)
+
+
+def connect_pool(config, minconn=DEFAULT_MIN_CONNECTIONS, maxconn=DEFAULT_MAX_CONNECTIONS):
+    """ Connect to the PostgreSQL database server with a pool of connections """
+
     try:
-        
-        connection_pool = pool.SimpleConnectionPool(1, 10, **config)
-        if connect_pool:
-            print("Connection pool created successfully")
-            return connection_pool
+        connection_pool = create_pool(config, minconn, maxconn)
+        print("Connection pool created successfully")
+        return connection_pool
 
     except (psycopg2.DatabaseError, Exception) as error:
-        print(error)
+        print("Error:", error)
+
+
+def is_healthy(conn):
+    """ Check that a connection is still open and that the server answers on it """
+
+    if conn.closed != 0:
+        return False
+
+    try:
+        # Only ping idle connections, a connection in the middle of a transaction is rolled back by the caller
+        if conn.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+        return True
+
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        return False
+
+
+@contextmanager
+def get_connection(connection_pool):
+    """ Check a healthy connection out of the pool and hand it back when the block is done
+
+    Broken connections are closed and dropped from the pool instead of being handed out.
+    If the block raises, its open transaction is rolled back before the connection goes back to the pool.
+    """
+
+    conn = None
+    for _ in range(CHECKOUT_ATTEMPTS):
+        conn = connection_pool.getconn()
+        if is_healthy(conn):
+            break
+
+        connection_pool.putconn(conn, close=True)
+        conn = None
+
+    if conn == None:
+        raise psycopg2.OperationalError("Could not check a working connection out of the pool")
+
+    broken = False
+    try:
+        yield conn
+
+    finally:
+        # Never return a connection that is closed or still holding an open transaction
+        # -> this also rolls back whatever the block left unfinished when it raised
+        if conn.closed != 0:
+            broken = True
+        elif conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                broken = True
+
+        connection_pool.putconn(conn, close=broken)
+
 
+def close_pool(connection_pool):
+    """ Close every connection of the pool """
 
+    if connection_pool != None and not connection_pool.closed:
+        connection_pool.closeall()
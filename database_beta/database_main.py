@@ -1,80 +1,182 @@
-import psycopg2
 from database_beta.config import load_config
 from database_beta import insertion_functions
-from database_beta import query_functions
-from database_beta.connect import connect_one, connect_pool
+from database_beta import migration_functions
+from database_beta import bundle_functions
+from database_beta.connect import create_pool, get_connection, close_pool, DEFAULT_MAX_CONNECTIONS
 
-import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 # Now import the function
 import scraping_beta.scraping_main as scrape
+from scraping_beta import media_functions
+
+
+"""
+* tier_checkpoint : Finds the checkpoint file of one tier when the free and paid lessons are scraped in the same run
+*
+* INPUTS
+* checkpoint_path (String) : The --checkpoint file, or None
+* paid (bool) : Specifies whether the paid lessons are being scraped
+*
+* OUTPUTS
+* checkpoint_path (String) : The checkpoint file of the tier, or None
+"""
+def tier_checkpoint(checkpoint_path, paid):
+    if checkpoint_path == None:
+        return None
+    return f"{checkpoint_path}.{'paid' if paid else 'free'}"
+
+
+"""
+* ingest_tier : Scrapes the lessons of one tier and writes them into the database
+*
+* INPUTS
+* connection_pool : The pool that a connection is checked out of for the whole run
+* args (argparse.Namespace) : The command line options
+* paid (bool) : Specifies whether the paid lessons are scraped
+* checkpoint_path (String) : The checkpoint file of the tier, or None
+* media_cache (dict) : Results of earlier media checks shared by the tiers, or None if the media links are not checked
+* Optional failures (list) : The failure report shared by the tiers. Lessons and tasks that could not be written are added to it
+*
+* OUTPUTS
+* num_tasks (int) : The number of tasks that were written
+"""
+def ingest_tier(connection_pool, args, paid, checkpoint_path, media_cache, failures=None):
+    with get_connection(connection_pool) as conn:
+        lessons = None
+        lesson_names = None
+        lesson_values = None
+        driver = None
+        if paid:
+            # The same login is used to scrape the lessons, so the driver stays open until the tier is done
+            lessons, driver = scrape.get_paid_links(args.cache_dir, args.offline, args.parser)
+            lesson_names = lessons['lesson_names']
+            lesson_values = [(lesson_names[i][0], 0) for i in range(len(lesson_names))]
+        else:
+            lessons = scrape.get_free_links(args.cache_dir, args.offline, args.parser)
+            lesson_names = lessons['lesson_names']
+            lesson_values = [(lesson_names[i][0], 0) for i in range(len(lesson_names))]
+
+        try:
+            # Every row this run changes is stamped with the catalog version it will produce
+            catalog_version = insertion_functions.next_catalog_version(conn, paid)
+
+            try:
+                # Insert the lessons and get back the id of every lesson title
+                lesson_ids = insertion_functions.insert_lesson(conn, lesson_values, many=True, paid=paid, catalog_version=catalog_version, failures=failures)
+
+                # Stream the tasks from the scraping module into the database
+                # Each lesson is written (in batches) as soon as it has been scraped
+                lessons = scrape.scrape_lessons(paid=paid, max_workers=args.workers, cache_dir=args.cache_dir, offline=args.offline, parser=args.parser, http_session=args.http_session, checkpoint_path=checkpoint_path, resume=args.resume, processes=args.processes, lesson_object=lessons, driver=driver)
+
+                # Check the media links of each lesson before it is written
+                if media_cache != None:
+                    lessons = media_functions.attach_media_manifests(lessons, media_cache, max_workers=args.media_workers)
+
+                num_tasks = insertion_functions.ingest_tasks(conn, lessons, batch_size=args.batch_size, paid=paid, bulk=args.bulk, lesson_ids=lesson_ids, failures=failures, catalog_version=catalog_version)
+
+                # Write the static catalog bundles from what is now in the database
+                if args.bundle_dir != None:
+                    catalog = bundle_functions.build_bundles(conn, args.bundle_dir, paid)
+                    print(f"{'Paid' if paid else 'Free'} catalog bundles written:", catalog['version'])
+
+            finally:
+                # The batches are committed as they go, so a run that fails partway may already have changed the tier
+                # -> make the cached API responses of the tier stale whenever anything was committed, even if the run failed
+                if conn.closed == 0:
+                    conn.rollback()
+                    if insertion_functions.has_catalog_changes(conn, catalog_version, paid):
+                        version = insertion_functions.bump_catalog_version(conn, paid)
+                        print(f"{'Paid' if paid else 'Free'} catalog version:", version)
+
+        finally:
+            if driver != None:
+                driver.quit()
+
+        return num_tasks
+
 
 if __name__ == "__main__":
-    paid = False
+    parser = argparse.ArgumentParser(description="Scrape the lessons from the website and insert them into the database")
+    parser.add_argument("--paid", action="store_true", help="Scrape the paid lessons instead of the free lessons")
+    parser.add_argument("--workers", type=int, default=scrape.fetch_functions.DEFAULT_MAX_WORKERS, help="The maximum number of lesson pages downloaded at the same time")
+    parser.add_argument("--cache-dir", default=None, help="A directory used to cache the downloaded pages between runs")
+    parser.add_argument("--offline", action="store_true", help="Only parse the pages stored in the cache directory")
+    parser.add_argument("--parser", default=scrape.parsing_functions.DEFAULT_PARSER, choices=scrape.parsing_functions.PARSER_BACKENDS, help="The HTML parser backend used for the pages")
+    parser.add_argument("--batch-size", type=int, default=insertion_functions.DEFAULT_BATCH_SIZE, help="The number of tasks written to the database at a time")
+    parser.add_argument("--http-session", action="store_true", help="Only use the browser to log in and download the paid pages concurrently over HTTP")
+    parser.add_argument("--media", action="store_true", help="Check every audio, image and video link and store a media manifest with each task")
+    parser.add_argument("--media-workers", type=int, default=scrape.fetch_functions.DEFAULT_MAX_WORKERS, help="The maximum number of media links checked at the same time")
+    parser.add_argument("--media-cache", default=None, help="A JSON file used to remember the media links that were already checked")
+    parser.add_argument("--checkpoint", default=None, help="A file recording every lesson that has been fully scraped")
+    parser.add_argument("--resume", action="store_true", help="Continue from the lessons recorded in the --checkpoint file instead of starting over")
+    parser.add_argument("--processes", type=int, default=1, help="The number of worker processes used to parse and extract the lesson pages")
+    parser.add_argument("--bulk", action="store_true", help="Load each batch of tasks with COPY and a single set-based upsert")
+    parser.add_argument("--both", action="store_true", help="Scrape the free and the paid lessons at the same time, each writing over its own pooled connection")
+    parser.add_argument("--failure-report", default=None, help="A JSON file listing every lesson and task that could not be written and why")
+    parser.add_argument("--bundle-dir", default=None, help="Write precompressed JSON bundles of every lesson and a catalog index to this directory (CATALOG_BUNDLE_ROOT)")
+    parser.add_argument("--unwrap-content", action="store_true", help="Convert task content stored as a JSON string into a jsonb array and exit")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_MAX_CONNECTIONS, help="The maximum number of database connections kept in the pool")
+    args = parser.parse_args()
+
+    if args.resume and args.checkpoint == None:
+        parser.error("--resume needs a --checkpoint file")
+    if args.both and args.paid:
+        parser.error("--both already includes the paid lessons")
+
+    tiers = [False, True] if args.both else [args.paid]
 
     # OPEN A CONNECTION (POOL)
+    # -> each tier checks out its own connection so that the free and paid lessons can be written at the same time
     config = load_config()
-    conn = connect_one(config)
-   
-    lessons = None
-    lesson_names = None
-    lesson_values = None
-    if paid:
-        lessons = scrape.get_paid_links()[0]
-        lesson_names = lessons['lesson_names']
-        lesson_values = [(lesson_names[i][0], 0) for i in range(len(lesson_names))]
-    else:
-        lessons = scrape.get_free_links()
-        lesson_names = lessons['lesson_names']
-        lesson_values = [(lesson_names[i][0], 0) for i in range(len(lesson_names))]
-
-    insertion_functions.insert_lesson(conn, lesson_values, many=True, paid=paid)
-
-    # Grab all of the tasks from the scraping module
-    result = scrape.scrape_lessons(paid=paid)
-    # Creat a cursor object to interact with the database
-    cur = conn.cursor()
-    # Instantiate a dictionary to hold all of the id's of the different lessons
-    # So that we don't have to query the database everytime we add a task
-    lesson_ids = {}
-    task_array = []
-
-    # Iterate through each task that we received
-    for task in result:
-        # Check if we have already found the id for the current lesson title
-        lesson_title = task[0]
-        id = lesson_ids.get(lesson_title, None)
-
-        # Query the database for the lesson id if it has not yet been found
-        if id == None:
-            sql = None
-            if paid == True:
-                sql = "SELECT id FROM api_paidlesson WHERE lesson_title = (%s)"
-            else:
-                sql = "SELECT id FROM api_freelesson WHERE lesson_title = (%s)"
+    connection_pool = create_pool(config, minconn=1, maxconn=max(args.pool_size, len(tiers)))
 
-            try:
-                # Execute the SQL code
-                values = (lesson_title,)
-                cur.execute(sql, values)
-
-                # Add the id to the dictionary for later use
-                id = cur.fetchone()[0]      
-                lesson_ids[lesson_title] = id
-            
-            except (Exception, psycopg2.DatabaseError) as error:
-                print("Error:", error)
-        
-        # Append the value tuple to the overall task array
-        task_array.append((id, task[1], json.dumps(task[2])))
-
-    cur.close()
-    print("Cursor closed:", cur.closed)
-
-    # Insert all of the found tasks to the database
-    insertion_functions.insert_task(conn, task_array, many=True, paid=paid)
-
-    # CLOSE THE CONNECTION (POOL)
-    conn.close()
-    print("Connection pool closed: ", conn.closed)
+    media_cache = None
+    if args.media:
+        media_cache = media_functions.load_media_cache(args.media_cache) if args.media_cache else {}
+
+    # Lessons and tasks that the database rejects are left out of their batch and collected here
+    failures = []
+
+    try:
+        # Fix the rows written by older ingests instead of scraping
+        if args.unwrap_content:
+            with get_connection(connection_pool) as conn:
+                for paid in tiers:
+                    catalog_version = insertion_functions.next_catalog_version(conn, paid)
+                    num_rows = migration_functions.unwrap_task_content(conn, paid, catalog_version=catalog_version)
+                    print(f"{'Paid' if paid else 'Free'} tasks converted:", num_rows)
+                    if num_rows > 0:
+                        insertion_functions.bump_catalog_version(conn, paid)
+
+        elif len(tiers) == 1:
+            num_tasks = ingest_tier(connection_pool, args, tiers[0], args.checkpoint, media_cache, failures)
+            print("Tasks ingested:", num_tasks)
+        else:
+            with ThreadPoolExecutor(max_workers=len(tiers)) as executor:
+                futures = {
+                    paid: executor.submit(ingest_tier, connection_pool, args, paid, tier_checkpoint(args.checkpoint, paid), media_cache, failures)
+                    for paid in tiers
+                }
+                for paid, future in futures.items():
+                    print(f"{'Paid' if paid else 'Free'} tasks ingested:", future.result())
+
+        if len(failures) > 0:
+            print("Rows that could not be written:", len(failures))
+        if args.failure_report:
+            insertion_functions.write_failure_report(args.failure_report, failures)
+
+        if args.media:
+            unreachable = sorted(url for url, media_info in media_cache.items() if not media_info['reachable'])
+            print("Unreachable media links:", len(unreachable))
+            for url in unreachable:
+                print("  ", url)
+
+            if args.media_cache:
+                media_functions.save_media_cache(args.media_cache, media_cache)
 
+    finally:
+        # CLOSE THE CONNECTION (POOL)
+        close_pool(connection_pool)
+        print("Connection pool closed: ", connection_pool.closed)
@@ -1,112 +1,404 @@
 import psycopg2
+from psycopg2.extras import execute_values, Json
 import json
+import csv
+import io
+import hashlib
 
+# The default number of tasks that are written to the database at a time
+DEFAULT_BATCH_SIZE = 200
+
+# One row of the task upsert -> (lesson_id, task_title, content, media_manifest, content_hash, catalog_version)
+TASK_UPSERT_TEMPLATE = "(%s, %s, %s, %s, %s, false, COALESCE(%s, 0), now())"
+
+"""
+* db_execute_rows : Runs SQL code once per row, each row behind its own savepoint
+* 
+* INPUTS
+* cur : A database cursor object inside an open transaction
+* sql (String) : SQL code to be exectuted
+* values (list[tuple]) : The rows to be written
+* Optional failures (list) : The failure report. One entry is added for every row that could not be written
+* Optional describe (function) : Turns a row into the dict that identifies it in the failure report
+*
+* OUPTUTS
+* written (list[tuple]) : The rows that were written
+*
+* ADDITIONAL
+* A bad row is rolled back to its savepoint, so it does not abort the rows around it.
+* Nothing is committed here, that is left to the caller
+"""
+def db_execute_rows(cur, sql, values, failures=None, describe=None):
+    written = []
+
+    for row in values:
+        cur.execute("SAVEPOINT ingest_row")
+        try:
+            cur.execute(sql, row)
+
+        # psycopg2 raises a ValueError itself for values it cannot send (e.g. a NUL character in a string)
+        except (psycopg2.Error, ValueError) as error:
+            cur.execute("ROLLBACK TO SAVEPOINT ingest_row")
+            print("Error:", error)
+
+            if failures != None:
+                failure = describe(row) if describe != None else {'row' : repr(row)}
+                failure.update({'error' : str(error).strip(), 'pgcode' : getattr(error, 'pgcode', None)})
+                failures.append(failure)
+            continue
+
+        cur.execute("RELEASE SAVEPOINT ingest_row")
+        written.append(row)
+
+    return written
+
+
+"""
+* db_execute_batch : Runs SQL code for a batch of rows, falling back to one row at a time if the batch fails
+* 
+* INPUTS
+* cur : A database cursor object inside an open transaction
+* sql (String) : SQL code to be exectuted
+* values (list[tuple]) : The rows to be written
+* Optional failures (list) : The failure report. One entry is added for every row that could not be written
+* Optional describe (function) : Turns a row into the dict that identifies it in the failure report
+*
+* OUPTUTS
+* written (list[tuple]) : The rows that were written
+*
+* ADDITIONAL
+* The whole batch runs behind one savepoint, so a clean batch costs a single savepoint.
+* Only when a row fails is the batch rolled back to it and retried row by row with db_execute_rows
+"""
+def db_execute_batch(cur, sql, values, failures=None, describe=None):
+    cur.execute("SAVEPOINT ingest_batch")
+
+    try:
+        for row in values:
+            cur.execute(sql, row)
+
+    except (psycopg2.Error, ValueError):
+        # One bad row aborts the whole batch, so find it by writing the rows one at a time
+        cur.execute("ROLLBACK TO SAVEPOINT ingest_batch")
+        return db_execute_rows(cur, sql, values, failures, describe)
+
+    cur.execute("RELEASE SAVEPOINT ingest_batch")
+    return list(values)
+
+
+"""
+* db_recount_tasks : Sets num_tasks of the given lessons to the number of tasks they actually have (removed tasks are not counted)
+* 
+* INPUTS
+* cur : A database cursor object
+* lesson_ids (iterable[int]) : The ids of the lessons to recount, or None to recount every lesson
+* Optional paid (bool) : Specifies whether the lessons are paid lessons
+* Optional catalog_version (int) : The catalog version stamped on the lessons whose count changed (see next_catalog_version)
+*
+* OUPTUTS
+* None
+*
+* ADDITIONAL
+* This is one aggregate UPDATE, so re-ingesting the same tasks never inflates the count and lessons whose
+* count is already right are not rewritten. The caller is in charge of committing
 """
-* db_commit_lessons : Commits values to the PostgreSQL database using the specified SQL code and database values
+def db_recount_tasks(cur, lesson_ids, paid=False, catalog_version=None):
+    task_table = 'api_paidtask' if paid else 'api_freetask'
+    lesson_table = 'api_paidlesson' if paid else 'api_freelesson'
+
+    lesson_filter = ""
+    values = (catalog_version,)
+    if lesson_ids != None:
+        lesson_filter = f"WHERE {lesson_table}.id = ANY(%s)"
+        values = (catalog_version, list(lesson_ids))
+
+    cur.execute(f"""
+    UPDATE {lesson_table} AS lesson
+    SET
+        num_tasks = task_counts.count,
+        catalog_version = COALESCE(%s, lesson.catalog_version),
+        updated_at = now()
+    FROM (
+        SELECT {lesson_table}.id AS lesson_id, count({task_table}.id) AS count
+        FROM {lesson_table}
+        LEFT JOIN {task_table} ON {task_table}.lesson_id = {lesson_table}.id AND NOT {task_table}.is_removed
+        {lesson_filter}
+        GROUP BY {lesson_table}.id
+    ) AS task_counts
+    WHERE lesson.id = task_counts.lesson_id
+    AND lesson.num_tasks IS DISTINCT FROM task_counts.count;
+    """, values)
+
+
+"""
+* db_commit_tasks : Commits task values to the PostgreSQL database using the specified SQL code and database values
 * 
 * INPUTS
 * conn : A database connection object
 * sql (String) : SQL code to be exectuted
 * values (Tuple or list[tuple]) : The value(s) to be inserted into the database
-* Optional many (bool) : Specifies whether there are multiple values to be inputted into the database
+* Optional paid (bool) : Specifies whether the tasks belong to paid lessons
+* Optional failures (list) : The failure report. Tasks that could not be written are added to it
+* Optional catalog_version (int) : The catalog version stamped on the lessons whose count changed
 *
 * OUPTUTS
-* None
+* num_tasks (int) : The number of tasks that were committed
+*
+* ADDITIONAL
+* A bad task does not abort the batch. It is reported in failures and the other tasks are still committed
 """
-def db_commit_lessons(conn, sql, values, many=False):
+def db_commit_tasks(conn, insert_sql, values, paid=False, failures=None, catalog_version=None):
     cur = conn.cursor()
+    num_tasks = 0
 
     try:
-        # Execute the SQL code
-        if not many:
-            cur.execute(sql, values)
-        else:
-            cur.executemany(sql, values)
-        
-        # Commit the changes to the database
+        describe = lambda row: {'paid' : paid, 'lesson_id' : row[0], 'task_title' : row[1]}
+        written = db_execute_batch(cur, insert_sql, values, failures, describe)
+
+        # Recount the tasks of every lesson that was written to
+        db_recount_tasks(cur, {row[0] for row in written}, paid, catalog_version)
+
         conn.commit()
+        num_tasks = len(written)
 
     except (Exception, psycopg2.DatabaseError) as error:
+        conn.rollback()
         print("Error:", error)
 
     finally:
         cur.close()
         print("Cursor closed:", cur.closed)
 
+    return num_tasks
+
 
 """
-* db_commit_tasks : Commits task values to the PostgreSQL database using the specified SQL code and database values
+* db_copy_tasks : Bulk loads task values into the PostgreSQL database with COPY and a single set-based upsert
 * 
 * INPUTS
 * conn : A database connection object
-* sql (String) : SQL code to be exectuted
-* values (Tuple or list[tuple]) : The value(s) to be inserted into the database
+* values (list[tuple]) : The values to be inserted into the database -> (lesson_id, task_title, content, media_manifest, content_hash)
+*   -> content and media_manifest are Python lists/dicts. They are encoded once here as the CSV text of the jsonb columns
+*   -> media_manifest is None if the media links were not checked, which keeps the stored manifest of the task
+* Optional paid (bool) : Specifies whether the tasks belong to paid lessons
+* Optional catalog_version (int) : The catalog version stamped on the tasks and lessons that change
 *
 * OUPTUTS
-* None
+* num_tasks (int) : The number of tasks that were committed, or None if the batch failed and was rolled back
+*
+* ADDITIONAL
+* The rows are streamed into a temporary staging table in one COPY, then moved into the task table with one
+* INSERT ... SELECT ... ON CONFLICT statement, and num_tasks of the lessons is recounted with one more. This costs a handful of
+* round trips per batch instead of one per task. If a task appears more than once in the batch, the last one wins
 """
-def db_commit_tasks(conn, insert_sql, values, paid=False):
+def db_copy_tasks(conn, values, paid=False, catalog_version=None):
+    task_table = 'api_paidtask' if paid else 'api_freetask'
+
     cur = conn.cursor()
+    num_tasks = None
 
-    lesson_counts = {}
+    try:
+        # The staging table only lives until the end of the transaction
+        cur.execute("""
+        CREATE TEMP TABLE task_staging (
+            row_number bigserial,
+            lesson_id bigint,
+            task_title varchar,
+            content jsonb,
+            media_manifest jsonb,
+            content_hash varchar
+        ) ON COMMIT DROP;
+        """)
+
+        # Write the rows as CSV and stream them into the staging table
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # An unchecked media manifest (None) is written as an empty field, which COPY reads as NULL
+        writer.writerows((row[0], row[1], json.dumps(row[2]), json.dumps(row[3]) if row[3] != None else None, row[4]) for row in values)
+        buffer.seek(0)
+
+        cur.copy_expert(
+            "COPY task_staging (lesson_id, task_title, content, media_manifest, content_hash) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+
+        # Upsert every staged row, leaving the rows whose hash has not changed untouched
+        cur.execute(f"""
+        INSERT INTO {task_table} (lesson_id, task_title, content, media_manifest, content_hash, is_removed, catalog_version, updated_at)
+        SELECT DISTINCT ON (lesson_id, task_title) lesson_id, task_title, content, media_manifest, content_hash, false, COALESCE(%s, 0), now()
+        FROM task_staging
+        ORDER BY lesson_id, task_title, row_number DESC
+        ON CONFLICT (lesson_id, task_title)
+        DO UPDATE SET
+            content = EXCLUDED.content,
+            media_manifest = COALESCE(EXCLUDED.media_manifest, {task_table}.media_manifest),
+            content_hash = EXCLUDED.content_hash,
+            is_removed = false,
+            catalog_version = COALESCE(%s, {task_table}.catalog_version),
+            updated_at = now()
+        WHERE {task_table}.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        OR {task_table}.is_removed
+        OR ({task_table}.media_manifest IS NULL AND EXCLUDED.media_manifest IS NOT NULL);
+        """, (catalog_version, catalog_version))
+
+        # Recount the tasks of every lesson that was written to
+        db_recount_tasks(cur, {row[0] for row in values}, paid, catalog_version)
+
+        conn.commit()
+        num_tasks = len(values)
+
+    except (Exception, psycopg2.DatabaseError) as error:
+        conn.rollback()
+        print("Error:", error)
+
+    finally:
+        cur.close()
+        print("Cursor closed:", cur.closed)
+
+    return num_tasks
+
+
+"""
+* db_upsert_lessons : Upserts lesson values in one multi-row statement and returns the ids of the lessons
+* 
+* INPUTS
+* conn : A database connection object
+* sql (String) : SQL code with a single VALUES %s placeholder that returns (id, lesson_title) rows
+* values (list[tuple]) : The values to be inserted into the database -> (lesson_title, num_tasks)
+* Optional failures (list) : The failure report. Lessons that could not be written are added to it
+* Optional paid (bool) : Specifies whether the lessons are paid lessons
+*
+* OUPTUTS
+* lesson_ids (dict) : The id of every lesson that was written or already existed, keyed by the lesson title
+*
+* ADDITIONAL
+* The statement runs behind a savepoint. If a lesson is rejected, the lessons are upserted again one at a time,
+* each behind its own savepoint, so a bad lesson is reported and left out instead of rolling back the others
+"""
+def db_upsert_lessons(conn, sql, values, failures=None, paid=False):
+    cur = conn.cursor()
+    lesson_ids = {}
 
     try:
-        for row in values:
-            lesson_id = row[0]
-            cur.execute(insert_sql, row)
-            lesson_counts[lesson_id] = lesson_counts.get(lesson_id, 0) + 1
-        
-        for lesson_id, count in lesson_counts.items():
-            if not paid:
-                cur.execute(
-                    "UPDATE api_freelesson SET num_tasks = num_tasks + %s WHERE id = %s",
-                    (count, lesson_id)
-                )
-            else:
-                cur.execute(
-                    "UPDATE api_paidlesson SET num_tasks = num_tasks + %s WHERE id = %s",
-                    (count, lesson_id)
-                )
+        # All of the lessons are sent in a single statement
+        cur.execute("SAVEPOINT ingest_batch")
+        try:
+            rows = execute_values(cur, sql, values, page_size=max(len(values), 1), fetch=True)
+            cur.execute("RELEASE SAVEPOINT ingest_batch")
+
+        except (psycopg2.Error, ValueError):
+            # One bad lesson aborts the whole statement, so find it by upserting the lessons one at a time
+            cur.execute("ROLLBACK TO SAVEPOINT ingest_batch")
+            rows = []
+
+            for value in values:
+                cur.execute("SAVEPOINT ingest_row")
+                try:
+                    rows.extend(execute_values(cur, sql, [value], fetch=True))
+
+                # psycopg2 raises a ValueError itself for values it cannot send (e.g. a NUL character in a string)
+                except (psycopg2.Error, ValueError) as error:
+                    cur.execute("ROLLBACK TO SAVEPOINT ingest_row")
+                    print("Error:", error)
+
+                    if failures != None:
+                        failures.append({'paid' : paid, 'lesson_title' : value[0], 'error' : str(error).strip(), 'pgcode' : getattr(error, 'pgcode', None)})
+                    continue
+
+                cur.execute("RELEASE SAVEPOINT ingest_row")
 
         conn.commit()
 
+        lesson_ids = {lesson_title: id for id, lesson_title in rows}
+
     except (Exception, psycopg2.DatabaseError) as error:
+        conn.rollback()
         print("Error:", error)
 
     finally:
         cur.close()
         print("Cursor closed:", cur.closed)
 
+    return lesson_ids
 
 
 """
-* insert_lesson : Inserts a new lesson into the PostgreSQL database
+* insert_lesson : Inserts new lessons into the PostgreSQL database and looks up the ids of all of the given lessons
 *
 * INPUTS
 * conn : A database connection object
-* values (tuple or list[tuple]) : The value(s) to be inserted into the database
+* values (tuple or list[tuple]) : The value(s) to be inserted into the database -> (lesson_title, num_tasks)
 * Optional many (bool) : Specifies whether there are multiple values to be inputted into the database
+* Optional catalog_version (int) : The catalog version stamped on the new lessons
+* Optional failures (list) : The failure report. Lessons that could not be written are added to it
 *
 * OUTPUTS
-* None
+* lesson_ids (dict) : The id of every given lesson (new or existing), keyed by the lesson title. Lessons that could not be written are left out
+*
+* ADDITIONAL
+* Lessons that already exist are left untouched. Their ids are read in the same statement that inserts the new lessons,
+* so the ingest does not have to look up any lesson ids afterwards
 """
-def insert_lesson(conn, values, many=False, paid=False):
-    # Insert a new lesson in the lessons table
-    sql = None
-    if paid == True:
-        sql = """
-        INSERT INTO api_paidlesson(lesson_title, num_tasks)
-        VALUES(%s, %s)
-        ON CONFLICT (lesson_title) DO NOTHING;
-        """ 
-    else:
-       sql = """
-        INSERT INTO api_freelesson(lesson_title, num_tasks)
-        VALUES(%s, %s)
-        ON CONFLICT (lesson_title) DO NOTHING;
-        """ 
-    
-    db_commit_lessons(conn, sql, values, many=many)
+def insert_lesson(conn, values, many=False, paid=False, catalog_version=None, failures=None):
+    if many == False:
+        values = [values]
+
+    # A lesson can only be upserted once per statement, so drop repeated titles
+    values = list({value[0]: value for value in values}.values())
+
+    # Insert the new lessons in the lessons table
+    # The existing lessons are read from the table snapshot taken before the insert, so no lesson is returned twice
+    table = 'api_paidlesson' if paid == True else 'api_freelesson'
+    sql = f"""
+    WITH input_lessons (lesson_title, num_tasks) AS (
+        VALUES %s
+    ),
+    inserted AS (
+        INSERT INTO {table} (lesson_title, num_tasks, catalog_version, updated_at)
+        SELECT lesson_title, num_tasks, {int(catalog_version or 0)}, now() FROM input_lessons
+        ON CONFLICT (lesson_title) DO NOTHING
+        RETURNING id, lesson_title
+    )
+    SELECT id, lesson_title FROM inserted
+    UNION ALL
+    SELECT {table}.id, {table}.lesson_title
+    FROM {table}
+    JOIN input_lessons ON input_lessons.lesson_title = {table}.lesson_title;
+    """
+
+    return db_upsert_lessons(conn, sql, values, failures, paid)
+
+
+"""
+* task_upsert_sql : Builds the INSERT ... ON CONFLICT statement that writes task rows one VALUES row at a time
+*
+* INPUTS
+* table (String) : The name of the task table
+* Optional values_clause (String) : The VALUES clause. The default takes one row, "%s" takes the rows of execute_values with TASK_UPSERT_TEMPLATE
+*
+* OUTPUTS
+* sql (String) : The statement. Its rows are (lesson_id, task_title, content, media_manifest, content_hash, catalog_version)
+*
+* ADDITIONAL
+* Existing tasks are only rewritten if their hash changed, they were flagged as removed or their media links are checked for the first time.
+* A task sent without a media manifest keeps the one that is stored
+"""
+def task_upsert_sql(table, values_clause=TASK_UPSERT_TEMPLATE):
+    return f"""
+    INSERT INTO {table} (lesson_id, task_title, content, media_manifest, content_hash, is_removed, catalog_version, updated_at)
+    VALUES {values_clause}
+    ON CONFLICT (lesson_id, task_title)
+    DO UPDATE SET
+        content = EXCLUDED.content,
+        media_manifest = COALESCE(EXCLUDED.media_manifest, {table}.media_manifest),
+        content_hash = EXCLUDED.content_hash,
+        is_removed = false,
+        catalog_version = GREATEST(EXCLUDED.catalog_version, {table}.catalog_version),
+        updated_at = now()
+    WHERE {table}.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+    OR {table}.is_removed
+    OR ({table}.media_manifest IS NULL AND EXCLUDED.media_manifest IS NOT NULL);
+    """
 
 
 """
@@ -114,31 +406,418 @@ def insert_lesson(conn, values, many=False, paid=False):
 *
 * INPUTS
 * conn : A database connection object
-* values (tuple or list[tuple]) : The value(s) to be inserted into the database
+* values (tuple or list[tuple]) : The value(s) to be inserted into the database -> (lesson_id, task_title, content, media_manifest[, content_hash])
+*   -> content and media_manifest are Python lists/dicts and are sent to the jsonb columns as they are (no json.dumps)
+*   -> media_manifest is None if the media links were not checked. The stored manifest of the task is then kept
+*   -> content_hash is computed with task_hash if it is left out
 * Optional many (bool) : Specifies whether there are multiple values to be inputted into the database
+* Optional bulk (bool) : Load the values with COPY and a single set-based upsert (see db_copy_tasks)
+* Optional failures (list) : The failure report. Tasks that could not be written are added to it
+* Optional catalog_version (int) : The catalog version stamped on the tasks and lessons that change (see next_catalog_version)
+*
+* OUTPUTS
+* num_tasks (int) : The number of tasks that were committed
+*
+* ADDITIONAL
+* If a COPY batch fails it is written again with one INSERT per task, so that only the bad tasks are left out
+"""
+def insert_task(conn, values, many=False, paid=False, bulk=False, failures=None, catalog_version=None):
+    # Hash the tasks that were handed over without one
+    rows = values if many else [values]
+    rows = [row if len(row) > 4 else (*row, task_hash(row[2])) for row in rows]
+
+    if bulk == True:
+        num_tasks = db_copy_tasks(conn, rows, paid, catalog_version)
+        if num_tasks != None:
+            return num_tasks
+
+    # Insert the new tasks in the tasks table (see task_upsert_sql)
+    table = 'api_paidtask' if paid == True else 'api_freetask'
+    sql = task_upsert_sql(table)
+
+    # Let psycopg2 adapt the content and media manifest straight to jsonb
+    # -> an unchecked media manifest is sent as NULL (Json(None) would be the JSON value null)
+    rows = [(row[0], row[1], Json(row[2]), Json(row[3]) if row[3] != None else None, row[4], catalog_version) for row in rows]
+
+    return db_commit_tasks(conn, sql, rows, paid, failures, catalog_version)
+
+
+
+
+"""
+* task_hash : Computes the hash that tells whether a task has changed since it was last written
+*
+* INPUTS
+* content (list) : The content objects of the task
+*
+* OUTPUTS
+* hash (String) : The SHA-256 hex digest of the canonical JSON of the content
+*
+* ADDITIONAL
+* The media manifest is left out on purpose. It is missing on runs that do not check the media links and its reachability
+* and sizes can change from one check to the next, so hashing it would rewrite every task without any change on the website
+"""
+def task_hash(content):
+    canonical = json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+"""
+* load_task_hashes : Reads the hash of every task already in the database with a single query
+*
+* INPUTS
+* conn : A database connection object
+* Optional paid (bool) : Specifies whether the paid tasks are read
+*
+* OUTPUTS
+* existing (dict) : {lesson_id: {task_title: (content_hash, is_removed, media_checked)}}
+*   -> media_checked is False while the task has no media manifest
+"""
+def load_task_hashes(conn, paid=False):
+    table = 'api_paidtask' if paid == True else 'api_freetask'
+    existing = {}
+
+    cur = conn.cursor()
+
+    try:
+        cur.execute(f"SELECT lesson_id, task_title, content_hash, is_removed, media_manifest IS NOT NULL FROM {table};")
+        for lesson_id, task_title, content_hash, is_removed, media_checked in cur:
+            existing.setdefault(lesson_id, {})[task_title] = (content_hash, is_removed, media_checked)
+
+        # Don't leave the read transaction open while the crawl runs
+        conn.rollback()
+
+    except (Exception, psycopg2.DatabaseError) as error:
+        conn.rollback()
+        print("Error:", error)
+
+    finally:
+        cur.close()
+        print("Cursor closed:", cur.closed)
+
+    return existing
+
+
+"""
+* flag_removed_tasks : Flags the tasks of a lesson that are no longer on the website
+*
+* INPUTS
+* conn : A database connection object
+* lesson_id (int) : The id of the lesson
+* task_titles (list[String]) : The titles of the tasks that disappeared
+* Optional paid (bool) : Specifies whether the lesson is a paid lesson
+* Optional catalog_version (int) : The catalog version stamped on the flagged tasks, so that clients syncing changes learn about them
 *
 * OUTPUTS
 * None
+*
+* ADDITIONAL
+* The rows are kept (user progress points at them) and are brought back by the next upsert of the same task
+"""
+def flag_removed_tasks(conn, lesson_id, task_titles, paid=False, catalog_version=None):
+    table = 'api_paidtask' if paid == True else 'api_freetask'
+
+    cur = conn.cursor()
+
+    try:
+        cur.execute(f"""
+        UPDATE {table}
+        SET
+            is_removed = true,
+            catalog_version = COALESCE(%s, catalog_version),
+            updated_at = now()
+        WHERE lesson_id = %s
+        AND task_title = ANY(%s)
+        AND NOT is_removed;
+        """, (catalog_version, lesson_id, list(task_titles)))
+
+        db_recount_tasks(cur, [lesson_id], paid, catalog_version)
+        conn.commit()
+
+    except (Exception, psycopg2.DatabaseError) as error:
+        conn.rollback()
+        print("Error:", error)
+
+    finally:
+        cur.close()
+        print("Cursor closed:", cur.closed)
+
+
 """
-def insert_task(conn, values, many=False, paid=False):
-    # Insert a new lesson in the lessons table
+* get_lesson_id : Looks up the id of a lesson from its title
+*
+* INPUTS
+* cur : A database cursor object
+* lesson_title (String) : The title of the lesson
+* Optional paid (bool) : Specifies whether the lesson is a paid lesson
+*
+* OUTPUTS
+* id (int) : The id of the lesson, or None if it could not be found
+"""
+def get_lesson_id(cur, lesson_title, paid=False):
     sql = None
     if paid == True:
-        sql = """
-        INSERT INTO api_paidtask (lesson_id, task_title, content)
-        VALUES (%s, %s, %s)
-        ON CONFLICT (lesson_id, task_title)
-        DO UPDATE SET
-            content = EXCLUDED.content;
-        """
+        sql = "SELECT id FROM api_paidlesson WHERE lesson_title = (%s)"
     else:
-        sql = """
-        INSERT INTO api_freetask (lesson_id, task_title, content)
-        VALUES (%s, %s, %s)
-        ON CONFLICT (lesson_id, task_title)
+        sql = "SELECT id FROM api_freelesson WHERE lesson_title = (%s)"
+
+    try:
+        # Execute the SQL code
+        values = (lesson_title,)
+        cur.execute(sql, values)
+
+        return cur.fetchone()[0]
+
+    except (Exception, psycopg2.DatabaseError) as error:
+        print("Error:", error)
+
+
+"""
+* ingest_tasks : Writes scraped tasks to the PostgreSQL database in batches as they arrive
+*
+* INPUTS
+* conn : A database connection object
+* lessons (iterable[list[tuple]]) : The scraped tasks, one list of (lesson_title, task_title, content) tuples per lesson
+*   -> This can be the generator returned by scraping_main.scrape_lessons
+*   -> The tuples may hold a fourth item with the media manifest of the task (see scraping_beta.media_functions). Without it the manifest stored in the database is kept
+* Optional batch_size (int) : The number of tasks that are collected before they are written and committed
+* Optional paid (bool) : Specifies whether the tasks belong to paid lessons
+* Optional bulk (bool) : Load each batch with COPY instead of one INSERT per task
+* Optional lesson_ids (dict) : The ids of the lessons keyed by title, as returned by insert_lesson. Titles missing from it are looked up
+* Optional failures (list) : The failure report. Every task that could not be written is added to it (see write_failure_report)
+* Optional catalog_version (int) : The catalog version stamped on every task and lesson that changes (see next_catalog_version)
+*
+* OUTPUTS
+* num_tasks (int) : The number of new or changed tasks that were committed
+*
+* ADDITIONAL
+* Every batch is committed on its own, so only the current batch needs to be held in memory and
+* everything that was written before a crash late in the crawl is kept.
+* The stored hashes are loaded once up front and tasks whose content has not changed are skipped.
+* Tasks scraped without a media manifest keep the stored one.
+* Once every lesson has been scraped, the stored tasks of a lesson that were not found on any of its pages are flagged as removed
+"""
+def ingest_tasks(conn, lessons, batch_size=DEFAULT_BATCH_SIZE, paid=False, bulk=False, lesson_ids=None, failures=None, catalog_version=None):
+    # Instantiate a dictionary to hold all of the id's of the different lessons
+    # So that we don't have to query the database everytime we add a task
+    lesson_ids = dict(lesson_ids or {})
+    task_batch = []
+    num_tasks = 0
+
+    # The titles found for each lesson across the whole run, since several pages can share a lesson title
+    scraped_titles = {}
+
+    # Read what is already stored so that unchanged tasks are never sent again
+    existing = load_task_hashes(conn, paid)
+
+    cur = conn.cursor()
+
+    try:
+        for lesson_tasks in lessons:
+            for task in lesson_tasks:
+                # Query the database for the lesson id if it has not yet been found
+                lesson_title = task[0]
+                if lesson_title not in lesson_ids:
+                    lesson_ids[lesson_title] = get_lesson_id(cur, lesson_title, paid)
+                lesson_id = lesson_ids[lesson_title]
+                scraped_titles.setdefault(lesson_id, set()).add(task[1])
+
+                # Tasks replayed from a checkpoint written before the content was kept as a list still hold JSON text
+                task_content = json.loads(task[2]) if isinstance(task[2], str) else task[2]
+                media_manifest = task[3] if len(task) > 3 else None
+
+                # Skip the task if it is stored with the same content and has not been flagged as removed
+                # -> unless its media links are checked for the first time, a new manifest alone does not rewrite the task
+                content_hash = task_hash(task_content)
+                stored = existing.get(lesson_id, {}).get(task[1])
+                if stored != None and stored[:2] == (content_hash, False) and (media_manifest == None or stored[2]):
+                    continue
+
+                # Append the value tuple to the current batch
+                task_batch.append((lesson_id, task[1], task_content, media_manifest, content_hash))
+
+            # Write the batch once it is full
+            if len(task_batch) >= batch_size:
+                num_tasks += insert_task(conn, task_batch, many=True, paid=paid, bulk=bulk, failures=failures, catalog_version=catalog_version)
+                task_batch = []
+
+        # Write whatever is left over
+        if len(task_batch) > 0:
+            num_tasks += insert_task(conn, task_batch, many=True, paid=paid, bulk=bulk, failures=failures, catalog_version=catalog_version)
+
+        # Flag the stored tasks that were not found on any page of their lesson
+        # -> this is only reached once every lesson was scraped, so a run that fails partway never flags anything
+        # -> a lesson whose pages all came back empty is more likely broken than without tasks, so it has no titles here and is left alone
+        for lesson_id, titles in scraped_titles.items():
+            if lesson_id == None:
+                continue
+
+            removed_titles = [
+                task_title for task_title, (_, is_removed, _) in existing.get(lesson_id, {}).items()
+                if task_title not in titles and not is_removed
+            ]
+            if len(removed_titles) > 0:
+                flag_removed_tasks(conn, lesson_id, removed_titles, paid, catalog_version)
+
+    finally:
+        cur.close()
+        print("Cursor closed:", cur.closed)
+
+    return num_tasks
+
+
+
+"""
+* recount_tasks : Repairs num_tasks of the lessons in the PostgreSQL database
+*
+* INPUTS
+* conn : A database connection object
+* Optional lesson_ids (iterable[int]) : The ids of the lessons to recount. Every lesson is recounted if not given
+* Optional paid (bool) : Specifies whether the lessons are paid lessons
+*
+* OUTPUTS
+* None
+"""
+def recount_tasks(conn, lesson_ids=None, paid=False):
+    cur = conn.cursor()
+
+    try:
+        db_recount_tasks(cur, lesson_ids, paid)
+        conn.commit()
+
+    except (Exception, psycopg2.DatabaseError) as error:
+        conn.rollback()
+        print("Error:", error)
+
+    finally:
+        cur.close()
+        print("Cursor closed:", cur.closed)
+
+
+
+"""
+* write_failure_report : Writes the rows that could not be ingested to a JSON file
+*
+* INPUTS
+* path (String) : The path of the report
+* failures (list[dict]) : The failure report filled in by insert_lesson and ingest_tasks
+*   -> Each entry holds the lesson_id and task_title of a task (or the lesson_title of a lesson), the database error and its SQLSTATE code (pgcode)
+*
+* OUTPUTS
+* None
+"""
+def write_failure_report(path, failures):
+    with open(path, "w", encoding="utf-8") as report_file:
+        json.dump(failures, report_file, indent=2, ensure_ascii=False)
+
+
+
+"""
+* next_catalog_version : Finds the catalog version that the current ingest of a tier will produce
+*
+* INPUTS
+* conn : A database connection object
+* Optional paid (bool) : Specifies whether the paid catalog is being ingested
+*
+* OUTPUTS
+* version (int) : The current catalog version plus one
+*
+* ADDITIONAL
+* Every row the ingest changes is stamped with this version, and bump_catalog_version makes it current once the ingest is done.
+* Clients that ask for the changes since an older version therefore never miss a row
+"""
+def next_catalog_version(conn, paid=False):
+    cur = conn.cursor()
+
+    try:
+        cur.execute("SELECT version FROM api_catalogversion WHERE tier = %s;", ('paid' if paid else 'free',))
+        row = cur.fetchone()
+        conn.rollback()
+
+        return (row[0] if row != None else 0) + 1
+
+    finally:
+        cur.close()
+        print("Cursor closed:", cur.closed)
+
+
+"""
+* has_catalog_changes : Checks whether any lesson or task of a tier was committed with the given catalog version
+*
+* INPUTS
+* conn : A database connection object
+* catalog_version (int) : The version handed out by next_catalog_version
+* Optional paid (bool) : Specifies whether the paid catalog is checked
+*
+* OUTPUTS
+* changed (bool) : True if at least one row carries the version (False if the check failed)
+*
+* ADDITIONAL
+* catalog_version is indexed, so this is two index probes
+"""
+def has_catalog_changes(conn, catalog_version, paid=False):
+    task_table = 'api_paidtask' if paid else 'api_freetask'
+    lesson_table = 'api_paidlesson' if paid else 'api_freelesson'
+    cur = conn.cursor()
+    changed = False
+
+    try:
+        cur.execute(f"""
+        SELECT EXISTS (SELECT 1 FROM {task_table} WHERE catalog_version >= %s)
+        OR EXISTS (SELECT 1 FROM {lesson_table} WHERE catalog_version >= %s);
+        """, (catalog_version, catalog_version))
+
+        changed = cur.fetchone()[0]
+        conn.rollback()
+
+    except (Exception, psycopg2.DatabaseError) as error:
+        conn.rollback()
+        print("Error:", error)
+
+    finally:
+        cur.close()
+        print("Cursor closed:", cur.closed)
+
+    return changed
+
+
+"""
+* bump_catalog_version : Raises the catalog version of a tier so that the cached API responses of the tier go stale
+*
+* INPUTS
+* conn : A database connection object
+* Optional paid (bool) : Specifies whether the paid catalog changed
+*
+* OUTPUTS
+* version (int) : The new catalog version, or None if it could not be raised
+*
+* ADDITIONAL
+* Call this at the end of an ingest once all of the changes are committed, and also when an ingest fails after committing some of them
+"""
+def bump_catalog_version(conn, paid=False):
+    cur = conn.cursor()
+    version = None
+
+    try:
+        cur.execute("""
+        INSERT INTO api_catalogversion (tier, version, updated_at)
+        VALUES (%s, 1, now())
+        ON CONFLICT (tier)
         DO UPDATE SET
-            content = EXCLUDED.content;
-        """
+            version = api_catalogversion.version + 1,
+            updated_at = now()
+        RETURNING version;
+        """, ('paid' if paid else 'free',))
+
+        version = cur.fetchone()[0]
+        conn.commit()
 
-    db_commit_tasks(conn, sql, values, paid)
+    except (Exception, psycopg2.DatabaseError) as error:
+        conn.rollback()
+        print("Error:", error)
+
+    finally:
+        cur.close()
+        print("Cursor closed:", cur.closed)
 
+    return version
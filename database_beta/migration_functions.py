@@ -0,0 +1,65 @@
+import psycopg2
+
+from database_beta.query_functions import tier_tables
+
+# The number of rows converted per transaction
+DEFAULT_MIGRATION_BATCH_SIZE = 1000
+
+
+"""
+* unwrap_task_content : Converts task content that was stored as a JSON string into a native jsonb array
+*
+* INPUTS
+* conn : A database connection object
+* Optional paid (bool) : Specifies whether the paid tasks are converted
+* Optional batch_size (int) : The number of rows converted and committed at a time
+* Optional catalog_version (int) : The catalog version stamped on the converted rows, so that syncing clients fetch them again
+*
+* OUPTUTS
+* num_rows (int) : The number of rows that were converted
+*
+* ADDITIONAL
+* Older ingests encoded the content twice, so the jsonb column holds a string with the JSON text of the array.
+* (content #>> '{}') takes the text back out of the string and ::jsonb parses it. Rows that already hold an array
+* are left alone, so the conversion can be run any number of times. Each batch is committed on its own to keep
+* the row locks short on a large table
+"""
+def unwrap_task_content(conn, paid=False, batch_size=DEFAULT_MIGRATION_BATCH_SIZE, catalog_version=None):
+    task_table = tier_tables(paid)[0]
+    num_rows = 0
+
+    sql = f"""
+    UPDATE {task_table}
+    SET
+        content = (content #>> '{{}}')::jsonb,
+        catalog_version = COALESCE(%s, catalog_version),
+        updated_at = now()
+    WHERE id IN (
+        SELECT id
+        FROM {task_table}
+        WHERE jsonb_typeof(content) = 'string'
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    );
+    """
+
+    cur = conn.cursor()
+
+    try:
+        while True:
+            cur.execute(sql, (catalog_version, batch_size))
+            conn.commit()
+
+            if cur.rowcount == 0:
+                break
+            num_rows += cur.rowcount
+
+    except (Exception, psycopg2.DatabaseError) as error:
+        conn.rollback()
+        print("Error:", error)
+
+    finally:
+        cur.close()
+        print("Cursor closed:", cur.closed)
+
+    return num_rows
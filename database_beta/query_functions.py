@@ -1,38 +1,180 @@
 import psycopg2
+from psycopg2 import extensions
+import itertools
 
-def db_query(conn, sql):
+# The default number of rows fetched from the server at a time when streaming a query
+DEFAULT_CHUNK_SIZE = 500
+
+# Gives every server-side cursor a unique name on its connection
+cursor_names = itertools.count()
+
+
+"""
+* tier_tables : Finds the task and lesson tables of a tier
+*
+* INPUTS
+* Optional paid (bool) : Specifies whether the paid tables are wanted
+*
+* OUPTUTS
+* task_table, lesson_table (tuple) : The names of the task table and the lesson table
+"""
+def tier_tables(paid=False):
+    if paid:
+        return 'api_paidtask', 'api_paidlesson'
+    return 'api_freetask', 'api_freelesson'
+
+
+"""
+* db_query : Runs a query and returns all of its rows
+*
+* INPUTS
+* conn : A database connection object
+* sql (String) : SQL code with %s placeholders for the parameters
+* Optional params (tuple) : The values of the placeholders
+*
+* OUPTUTS
+* rows (list[tuple]) : The rows of the result, or None if the query failed
+*
+* ADDITIONAL
+* The whole result is loaded into memory, so this is meant for small results. Use db_stream for large ones
+"""
+def db_query(conn, sql, params=None):
     cur = conn.cursor()
 
     try:
         # Execute the SQL code
-        cur.execute(sql)
+        cur.execute(sql, params)
 
-        rows = cur.fetchall() 
+        rows = cur.fetchall()
         return rows
-        
+
     except (Exception, psycopg2.DatabaseError) as error:
+        conn.rollback()
         print("Error:", error)
 
     finally:
         cur.close()
-        # print("Cursor closed:", cur.closed)
-        print("Cursor closed")
+        print("Cursor closed:", cur.closed)
+
+
+"""
+* db_stream : Runs a query on a server-side cursor and yields its rows a chunk at a time
+*
+* INPUTS
+* conn : A database connection object
+* sql (String) : SQL code with %s placeholders for the parameters
+* Optional params (tuple) : The values of the placeholders
+* Optional chunk_size (int) : The number of rows fetched from the server at a time
+*
+* OUPTUTS
+* (generator) : Yields the rows of the result one at a time
+*
+* ADDITIONAL
+* Only one chunk of rows is held in memory, however large the result is.
+* A server-side cursor lives inside a transaction. If the connection was idle when the stream started,
+* that transaction is rolled back once the stream is finished or closed. Errors are raised to the caller, because a
+* half read stream must not be mistaken for the full result
+"""
+def db_stream(conn, sql, params=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    owns_transaction = conn.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE
+
+    cur = conn.cursor(name=f"stream_{next(cursor_names)}")
+    cur.itersize = chunk_size
+
+    try:
+        cur.execute(sql, params)
+        for row in cur:
+            yield row
+
+    finally:
+        if not cur.closed and conn.closed == 0:
+            cur.close()
+        if owns_transaction and conn.closed == 0:
+            conn.rollback()
+
 
+"""
+* query_tasks : Gets the content of every task of a lesson
+*
+* INPUTS
+* conn : A database connection object
+* lesson_title (String) : The title of the lesson
+* Optional paid (bool) : Specifies whether the lesson is a paid lesson
+*
+* OUPTUTS
+* rows (list[tuple]) : One (content,) row per task, in the order the tasks were inserted
+"""
+def query_tasks(conn, lesson_title, paid=False):
+    task_table, lesson_table = tier_tables(paid)
 
-def query_tasks(conn, lesson_title):
     sql = f"""
     SELECT t.content
-    FROM test.tasks t
-    JOIN test.lessons l ON t.lesson_title=l.title
-    WHERE l.title = '{lesson_title}'
+    FROM {task_table} t
+    JOIN {lesson_table} l ON t.lesson_id = l.id
+    WHERE l.lesson_title = %s
     ORDER BY t.id;
     """
 
-    sql_test =f"""
-    SELECT t.content
-    FROM api_task t
-    JOIN api_lesson l ON t.lesson_id = l.id
-    WHERE l.lesson_title = '{lesson_title}';
+    return db_query(conn, sql, (lesson_title,))
+
+
+"""
+* iter_tasks : Streams the tasks of a tier (or of one lesson) in constant memory
+*
+* INPUTS
+* conn : A database connection object
+* Optional paid (bool) : Specifies whether the paid tasks are read
+* Optional lesson_id (int) : Only read the tasks of this lesson
+* Optional chunk_size (int) : The number of rows fetched from the server at a time
+* Optional include_removed (bool) : Also read the tasks that were flagged as removed from the website
+*
+* OUPTUTS
+* (generator) : Yields (id, lesson_id, lesson_title, task_title, content, media_manifest) rows ordered by task id
+"""
+def iter_tasks(conn, paid=False, lesson_id=None, chunk_size=DEFAULT_CHUNK_SIZE, include_removed=False):
+    task_table, lesson_table = tier_tables(paid)
+
+    conditions = []
+    params = ()
+    if include_removed == False:
+        conditions.append("NOT t.is_removed")
+    if lesson_id != None:
+        conditions.append("t.lesson_id = %s")
+        params = (lesson_id,)
+
+    lesson_filter = ""
+    if len(conditions) > 0:
+        lesson_filter = "WHERE " + " AND ".join(conditions)
+
+    sql = f"""
+    SELECT t.id, t.lesson_id, l.lesson_title, t.task_title, t.content, t.media_manifest
+    FROM {task_table} t
+    JOIN {lesson_table} l ON t.lesson_id = l.id
+    {lesson_filter}
+    ORDER BY t.id;
+    """
+
+    return db_stream(conn, sql, params, chunk_size)
+
+
+"""
+* iter_lessons : Streams the lessons of a tier in constant memory
+*
+* INPUTS
+* conn : A database connection object
+* Optional paid (bool) : Specifies whether the paid lessons are read
+* Optional chunk_size (int) : The number of rows fetched from the server at a time
+*
+* OUPTUTS
+* (generator) : Yields (id, lesson_title, num_tasks) rows ordered by lesson id
+"""
+def iter_lessons(conn, paid=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    lesson_table = tier_tables(paid)[1]
+
+    sql = f"""
+    SELECT id, lesson_title, num_tasks
+    FROM {lesson_table}
+    ORDER BY id;
     """
 
-    return db_query(conn, sql_test)
\ No newline at end of file
+    return db_stream(conn, sql, (), chunk_size)
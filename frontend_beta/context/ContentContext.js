@@ -3,7 +3,7 @@ import { Alert, AppState } from 'react-native';
 
 import api from '../utils/api'
 import { AuthContext } from '../context/AuthContext';
-import { getBatchQueue, saveBatchQueue, clearBatchQueue, saveFreeLessons, getFreeLessons} from '../storage/content';
+import { getBatchQueue, saveBatchQueue, clearBatchQueue, saveFreeLessons, getFreeLessons, saveCachedResponse, getCachedResponse } from '../storage/content';
 
 export const ContentContext = createContext()
 
@@ -23,6 +23,36 @@ export const ContentProvider = ({ children }) => {
     const appStateRef = useRef(AppState.currentState);
     const intervalRef = useRef(null);
 
+    /*
+    * getWithETag (async) -> This function GETs a catalog route, reusing the stored copy of it when the backend says it has not changed
+    * 
+    * FIELDS
+    *   url (String) -> The API route to request
+    * 
+    * ADDITIONAL
+    * The ETag of the stored copy is sent as If-None-Match. If the catalog has not changed the backend answers
+    * 304 Not Modified with an empty body, and the stored copy is returned instead of downloading it again
+    */
+    const getWithETag = async (url) => {
+        const cached = await getCachedResponse(url)
+
+        const res = await api.get(url, {
+            headers: cached && cached.etag ? { 'If-None-Match': cached.etag } : {},
+            validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+        })
+
+        if (res.status === 304 && cached) {
+            return cached.data
+        }
+
+        // Remember the new copy for the next visit
+        if (res.headers.etag) {
+            saveCachedResponse(url, res.headers.etag, res.data)
+        }
+
+        return res.data
+    }
+
     /*
     * getFreeLessons (async) -> This function will retrieve all of the free lessons available to the logged in user
     *   It will compile a list of all of the lessons as well as which ones have been completed.
@@ -39,12 +69,11 @@ export const ContentProvider = ({ children }) => {
         try {
             // Retrieve all of the free lessons in the database
             // Also retrieve all of the free lessons that the user has completed
-            const res_all = await api.get('api/all-free-lessons/')
+            const all_lessons = await getWithETag('api/all-free-lessons/')
             // const res_completed = await api.get(`api/free-completed-lessons/${userEmail}/`)
             
             // Get the actual data
             // Additionally, aggregate all of the completed lesson titles into a list
-            const all_lessons = res_all.data // -> List of objects
             // const completed_lessons = new Set(res_completed.data.map(item => item.lesson_id)) // -> List of objects
            
             // Give each lesson a property called 'is_completed'
@@ -96,12 +125,11 @@ export const ContentProvider = ({ children }) => {
         // Check if the the tasks from this lesson have already been fetched
         if (!(lesson_id in freeTasks)){
             try {
-                const res_tasks = await api.get(`api/free-tasks-by-lesson/${lesson_id}/`)
+                const tasks_by_lesson = await getWithETag(`api/free-tasks-by-lesson/${lesson_id}/`)
                 // const res_completed = await api.get(`api/free-completed-tasks/${userEmail}/`)
 
                 // Get the actual data
                 // Additionally, aggregate all of the completed task titles into a list
-                const tasks_by_lesson = res_tasks.data
                 // const completed_tasks = new Set(res_completed.data.map(item => item.task_id))
             
                 // Give each lesson a property called 'is_completed'
@@ -118,4 +118,41 @@ export async function getFreeLessons() {
     } catch (error) {
         console.log('Error retrieving free lessons', error)
     }
-}
\ No newline at end of file
+}
+
+/*
+* saveCachedResponse (async) -> This function stores the body of an API response together with its ETag
+*   so that the next request for the same route can ask the backend whether it has changed
+* 
+* FIELDS
+*   url (String) -> The API route that was requested
+*   etag (String) -> The ETag header of the response
+*   data (any) -> The body of the response
+*/
+export async function saveCachedResponse(url, etag, data) {
+    try {
+        await AsyncStorage.setItem(`response:${url}`, JSON.stringify({ etag, data }));
+    } catch (error) {
+        console.log('Error storing response', error)
+    }
+}
+
+
+/*
+* getCachedResponse (async) -> Retrieve the stored body and ETag of an API route
+* 
+* FIELDS
+*   url (String) -> The API route that was requested
+* 
+* ADDITIONAL
+* Returns null if the route has not been stored yet
+*/
+export async function getCachedResponse(url) {
+    try {
+        const value = await AsyncStorage.getItem(`response:${url}`);
+        return value != null ? JSON.parse(value) : null;
+    } catch (error) {
+        console.log('Error retrieving response', error)
+        return null;
+    }
+}
@@ -0,0 +1,470 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import bs4
+
+from scraping_beta import extraction_functions
+from scraping_beta import fetch_functions
+from scraping_beta import parsing_functions
+from scraping_beta import scraping_main
+
+# The recorded pages that ship with the repository
+# -> index.html is a page of lesson links and lessons/<name>.html holds the lesson page linked as .../<name>
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Where the results of every run are saved so that runs can be compared between commits
+DEFAULT_RESULTS_DIR = ".benchmarks"
+
+# The extraction functions that are timed on every child of the blog content
+EXTRACTORS = (
+    'extract_table',
+    'extract_videos',
+    'extract_image',
+    'extract_audio_type_1',
+    'extract_audio_type_2',
+    'extract_paragraphs',
+    'classify_node',
+)
+
+
+"""
+* load_pages : This function reads recorded HTML pages from disk
+*
+* INPUTS
+* paths (list[String]) : HTML files, or directories (such as a scraper cache directory) whose .html files should be read
+*
+* OUTPUTS
+* pages (list[String]) : The HTML text of every page found
+"""
+def load_pages(paths):
+    pages = []
+
+    for path in paths:
+        files = sorted(glob.glob(os.path.join(path, "*.html"))) if os.path.isdir(path) else [path]
+        for file_path in files:
+            with open(file_path, encoding="utf-8") as html_file:
+                pages.append(html_file.read())
+
+    return pages
+
+
+"""
+* load_fixtures : This function reads a directory of recorded pages
+*
+* INPUTS
+* Optional fixtures_dir (String) : The directory holding index.html and the lessons/ directory
+*
+* OUTPUTS
+* index_html (String) : The HTML of the page of lesson links
+* lesson_pages (dict) : The HTML of each lesson page, keyed by the lesson extension found in the index
+"""
+def load_fixtures(fixtures_dir=DEFAULT_FIXTURES_DIR):
+    with open(os.path.join(fixtures_dir, "index.html"), encoding="utf-8") as index_file:
+        index_html = index_file.read()
+
+    lesson_object = scraping_main.get_links(parsing_functions.parse_links_page(index_html))
+
+    lesson_pages = {}
+    for extension in lesson_object['lesson_extensions']:
+        name = extension.rstrip("/").split("/")[-1]
+        with open(os.path.join(fixtures_dir, "lessons", name + ".html"), encoding="utf-8") as lesson_file:
+            lesson_pages[extension] = lesson_file.read()
+
+    return index_html, lesson_pages
+
+
+"""
+* record_fixtures : This function copies the pages of a scraper cache directory into the fixtures layout
+*
+* INPUTS
+* cache_dir (String) : A cache directory filled by a scrape run with cache_dir set
+* fixtures_dir (String) : The directory to write index.html and lessons/ to
+* Optional paid (bool) : Specifies whether the cache holds a paid crawl
+*
+* OUTPUTS
+* None
+"""
+def record_fixtures(cache_dir, fixtures_dir, paid=False):
+    index_url = "https://www.speechmodification.com/online-practice" if paid else "https://www.speechmodification.com/free"
+    index_html, _ = fetch_functions.load_cached_page(cache_dir, index_url)
+    if index_html == None:
+        raise FileNotFoundError(f"No cached copy of {index_url} in {cache_dir}")
+
+    os.makedirs(os.path.join(fixtures_dir, "lessons"), exist_ok=True)
+    with open(os.path.join(fixtures_dir, "index.html"), "w", encoding="utf-8") as index_file:
+        index_file.write(index_html)
+
+    lesson_object = scraping_main.get_links(parsing_functions.parse_links_page(index_html))
+    for extension in lesson_object['lesson_extensions']:
+        lesson_html, _ = fetch_functions.load_cached_page(cache_dir, f"https://www.speechmodification.com{extension}")
+        if lesson_html == None:
+            print("Not cached:", extension)
+            continue
+
+        name = extension.rstrip("/").split("/")[-1]
+        with open(os.path.join(fixtures_dir, "lessons", name + ".html"), "w", encoding="utf-8") as lesson_file:
+            lesson_file.write(lesson_html)
+
+
+"""
+* measure_allocations : This function counts the memory allocations made by a function call
+*
+* INPUTS
+* function : The function to call
+* args : The arguments passed to the function
+*
+* OUTPUTS
+* blocks, peak_kib (tuple) : The number of memory blocks allocated by the call and the peak memory it used (KiB)
+"""
+def measure_allocations(function, *args):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = function(*args)
+    after = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    return blocks, peak / 1024
+
+
+"""
+* benchmark_parsers : This function times how long each parser backend takes to build the documents of the given pages
+*
+* INPUTS
+* pages (list[String]) : The HTML text of the pages to parse
+* Optional backends (tuple) : The parser backends to compare. Backends that are not installed are skipped
+* Optional repeat (int) : The number of times every page is parsed. The fastest round is reported
+*
+* OUTPUTS
+* results (list[dict]) : One result per backend and scoping with the parse time per page (ms) and the peak memory per page (KiB)
+*
+* ADDITIONAL
+* Each backend is measured both on the full document and on the SoupStrainer scoped document used by scrape_lessons
+"""
+def benchmark_parsers(pages, backends=parsing_functions.PARSER_BACKENDS, repeat=3):
+    results = []
+
+    for backend in backends:
+        try:
+            parsing_functions.check_parser(backend)
+        except ValueError as error:
+            print("Skipping:", error)
+            continue
+
+        for scope, strainer in (("full", None), ("scoped", parsing_functions.LESSON_PAGE_STRAINER)):
+            # Time the parsing on its own first, tracemalloc slows it down
+            best_time = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for html in pages:
+                    parsing_functions.parse_html(html, backend, strainer)
+                elapsed = time.perf_counter() - start
+                best_time = elapsed if best_time == None else min(best_time, elapsed)
+
+            # Then measure the peak memory that building one page needs
+            peak_memory = 0
+            for html in pages:
+                tracemalloc.start()
+                doc = parsing_functions.parse_html(html, backend, strainer)
+                peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                del doc
+
+            results.append({
+                'backend' : backend,
+                'scope' : scope,
+                'ms_per_page' : best_time * 1000 / max(len(pages), 1),
+                'peak_kib_per_page' : peak_memory / 1024,
+            })
+
+    return results
+
+
+"""
+* benchmark_get_links : This function times reading the lesson links from a recorded page of links
+*
+* INPUTS
+* index_html (String) : The HTML of the page of lesson links
+* Optional parser (String) : The parser backend used to build the document
+* Optional repeat (int) : The number of rounds. The fastest round is reported
+*
+* OUTPUTS
+* result (dict) : The time per call (ms), including parsing, and its allocation counts
+"""
+def benchmark_get_links(index_html, parser=parsing_functions.DEFAULT_PARSER, repeat=20):
+    get_links = lambda: scraping_main.get_links(parsing_functions.parse_links_page(index_html, parser))
+
+    best_time = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        get_links()
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time == None else min(best_time, elapsed)
+
+    blocks, peak_kib = measure_allocations(get_links)
+
+    return {
+        'name' : 'get_links',
+        'ms_per_call' : best_time * 1000,
+        'alloc_blocks' : blocks,
+        'peak_kib' : peak_kib,
+    }
+
+
+"""
+* benchmark_scrape_lessons : This function runs scrape_lessons offline over the recorded pages
+*
+* INPUTS
+* index_html (String) : The HTML of the page of lesson links
+* lesson_pages (dict) : The HTML of each lesson page, keyed by the lesson extension
+* Optional parser (String) : The parser backend used to build the documents
+* Optional repeat (int) : The number of full runs. The fastest run is reported
+*
+* OUTPUTS
+* result (dict) : The number of pages and tasks, the pages per second and the allocation counts of one run
+*
+* ADDITIONAL
+* The recorded pages are put in a temporary response cache so that the real scrape_lessons code path is measured in offline mode
+"""
+def benchmark_scrape_lessons(index_html, lesson_pages, parser=parsing_functions.DEFAULT_PARSER, repeat=3):
+    cache_dir = tempfile.mkdtemp(prefix="scrape-benchmark-")
+
+    try:
+        fetch_functions.store_cached_page(cache_dir, "https://www.speechmodification.com/free", index_html)
+        for extension, html in lesson_pages.items():
+            fetch_functions.store_cached_page(cache_dir, f"https://www.speechmodification.com{extension}", html)
+
+        scrape = lambda: [task for lesson in scraping_main.scrape_lessons(cache_dir=cache_dir, offline=True, parser=parser) for task in lesson]
+
+        best_time = None
+        num_tasks = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            num_tasks = len(scrape())
+            elapsed = time.perf_counter() - start
+            best_time = elapsed if best_time == None else min(best_time, elapsed)
+
+        blocks, peak_kib = measure_allocations(scrape)
+
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    return {
+        'name' : 'scrape_lessons',
+        'pages' : len(lesson_pages),
+        'tasks' : num_tasks,
+        'pages_per_sec' : len(lesson_pages) / best_time,
+        'alloc_blocks' : blocks,
+        'peak_kib' : peak_kib,
+    }
+
+
+"""
+* benchmark_extractors : This function times each extraction function on every child of the blog content of the recorded pages
+*
+* INPUTS
+* pages (list[String]) : The HTML text of the lesson pages
+* Optional parser (String) : The parser backend used to build the documents
+* Optional repeat (int) : The number of rounds. The fastest round is reported
+*
+* OUTPUTS
+* results (list[dict]) : The total time (ms), the number of calls and the allocation counts of each function in EXTRACTORS
+*
+* ADDITIONAL
+* Extracting a paragraph replaces its <br> tags, so every function is run on freshly parsed documents
+"""
+def benchmark_extractors(pages, parser=parsing_functions.DEFAULT_PARSER, repeat=3):
+    def blog_children():
+        children = []
+        for html in pages:
+            doc = parsing_functions.parse_lesson_page(html, parser)
+            for content in doc.find_all(class_='blog-content'):
+                children.extend(child for child in content.children if isinstance(child, bs4.Tag))
+        return children
+
+    results = []
+
+    for name in EXTRACTORS:
+        extractor = getattr(extraction_functions, name)
+
+        best_time = None
+        num_calls = 0
+        for _ in range(repeat):
+            children = blog_children()
+            num_calls = len(children)
+
+            start = time.perf_counter()
+            for child in children:
+                extractor(child)
+            elapsed = time.perf_counter() - start
+            best_time = elapsed if best_time == None else min(best_time, elapsed)
+
+        children = blog_children()
+        blocks, peak_kib = measure_allocations(lambda: [extractor(child) for child in children])
+
+        results.append({
+            'name' : name,
+            'calls' : num_calls,
+            'total_ms' : best_time * 1000,
+            'alloc_blocks' : blocks,
+            'peak_kib' : peak_kib,
+        })
+
+    return results
+
+
+"""
+* run_benchmarks : This function runs the whole benchmark suite on a directory of recorded pages
+*
+* INPUTS
+* Optional fixtures_dir (String) : The directory holding index.html and the lessons/ directory
+* Optional parser (String) : The parser backend used by the get_links, scrape_lessons and extractor benchmarks
+* Optional repeat (int) : The number of rounds for each benchmark
+*
+* OUTPUTS
+* run (dict) : The results of every benchmark together with the commit and time of the run
+"""
+def run_benchmarks(fixtures_dir=DEFAULT_FIXTURES_DIR, parser=parsing_functions.DEFAULT_PARSER, repeat=3):
+    index_html, lesson_pages = load_fixtures(fixtures_dir)
+    pages = list(lesson_pages.values())
+
+    return {
+        'commit' : current_commit(),
+        'time' : datetime.now(timezone.utc).isoformat(),
+        'parser' : parser,
+        'get_links' : [benchmark_get_links(index_html, parser)],
+        'scrape_lessons' : [benchmark_scrape_lessons(index_html, lesson_pages, parser, repeat)],
+        'extractors' : benchmark_extractors(pages, parser, repeat),
+        'parsers' : benchmark_parsers(pages, repeat=repeat),
+    }
+
+
+"""
+* current_commit : This function finds the git commit that the benchmark is being run on
+*
+* INPUTS
+* None
+*
+* OUTPUTS
+* commit (String) : The short hash of the current commit, or "unknown" outside of a git checkout
+"""
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+"""
+* save_results : This function saves the results of a run as JSON and returns the previous run (if any)
+*
+* INPUTS
+* run (dict) : The results returned by run_benchmarks
+* Optional results_dir (String) : The directory where every run is saved
+*
+* OUTPUTS
+* previous (dict) : The most recent run that was saved before this one, or None
+"""
+def save_results(run, results_dir=DEFAULT_RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+
+    previous = None
+    saved_runs = sorted(glob.glob(os.path.join(results_dir, "*.json")))
+    if saved_runs:
+        with open(saved_runs[-1], encoding="utf-8") as previous_file:
+            previous = json.load(previous_file)
+
+    file_name = f"{run['time'].replace(':', '').split('.')[0]}-{run['commit']}.json"
+    with open(os.path.join(results_dir, file_name), "w", encoding="utf-8") as results_file:
+        json.dump(run, results_file, indent=2)
+
+    return previous
+
+
+"""
+* compare_results : This function prints how the timings of a run changed compared to a previous run
+*
+* INPUTS
+* run (dict) : The results of the current run
+* previous (dict) : The results of an earlier run
+*
+* OUTPUTS
+* None
+"""
+def compare_results(run, previous):
+    print(f"\nCompared to {previous['commit']} ({previous['time']}):")
+
+    for section, key, metric in (('get_links', 'name', 'ms_per_call'), ('scrape_lessons', 'name', 'pages_per_sec'), ('extractors', 'name', 'total_ms')):
+        old_results = {result[key]: result for result in previous.get(section, [])}
+        for result in run[section]:
+            old_result = old_results.get(result[key])
+            if old_result == None or not old_result.get(metric):
+                continue
+
+            change = (result[metric] - old_result[metric]) / old_result[metric] * 100
+            print(f"  {result[key]:<22} {metric:<14} {old_result[metric]:>10.3f} -> {result[metric]:>10.3f} ({change:+.1f}%)")
+
+
+"""
+* print_results : This function prints benchmark results as a table
+*
+* INPUTS
+* results (list[dict]) : The results returned by one of the benchmark functions
+*
+* OUTPUTS
+* None
+"""
+def print_results(results):
+    if len(results) == 0:
+        print("No results")
+        return
+
+    columns = list(results[0].keys())
+    rows = [[f"{value:.3f}" if isinstance(value, float) else str(value) for value in result.values()] for result in results]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+
+    print("  ".join(column.ljust(widths[i]) for i, column in enumerate(columns)))
+    for row in rows:
+        print("  ".join(value.ljust(widths[i]) for i, value in enumerate(row)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scraper offline on recorded lesson pages")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="The directory holding index.html and lessons/*.html")
+    parser.add_argument("--parser", default=parsing_functions.DEFAULT_PARSER, choices=parsing_functions.PARSER_BACKENDS, help="The HTML parser backend to benchmark with")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of rounds to run for every benchmark")
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR, help="The directory where the results of every run are saved")
+    parser.add_argument("--no-save", action="store_true", help="Do not save the results of this run")
+    parser.add_argument("--record-from-cache", default=None, help="Copy the pages of a scraper cache directory into --fixtures instead of benchmarking")
+    parser.add_argument("--parsers-only", nargs="+", default=None, help="Only compare the parser backends on these HTML files or directories")
+    args = parser.parse_args()
+
+    if args.record_from_cache != None:
+        record_fixtures(args.record_from_cache, args.fixtures)
+
+    elif args.parsers_only != None:
+        pages = load_pages(args.parsers_only)
+        print(f"Parsing {len(pages)} pages")
+        print_results(benchmark_parsers(pages, repeat=args.repeat))
+
+    else:
+        run = run_benchmarks(args.fixtures, args.parser, args.repeat)
+
+        for section in ('get_links', 'scrape_lessons', 'extractors', 'parsers'):
+            print(f"\n{section}")
+            print_results(run[section])
+
+        if not args.no_save:
+            previous = save_results(run, args.results_dir)
+            if previous != None:
+                compare_results(run, previous)
@@ -0,0 +1,79 @@
+import json
+import os
+
+
+"""
+* load_checkpoint : This function reads the lessons that were fully processed by an earlier scrape run
+*
+* INPUTS
+* path (String) : The path of the checkpoint file
+* Optional paid (bool) : Specifies whether the current run is scraping the paid lessons
+*
+* OUTPUTS
+* completed (dict) : The extracted tasks of every finished lesson, keyed by the lesson extension from get_links
+*
+* ADDITIONAL
+* The file holds one JSON line per finished lesson. A last line that was cut off by a crash is removed from the file
+"""
+def load_checkpoint(path, paid=False):
+    completed = {}
+
+    if not os.path.exists(path):
+        return completed
+
+    with open(path, "rb+") as checkpoint_file:
+        data = checkpoint_file.read()
+
+        # Cut off a last line that was only partly written when the run died
+        # -> otherwise the next recorded lesson would be appended to the broken line
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            checkpoint_file.truncate(end)
+
+    for line in data[:end].decode("utf-8").splitlines():
+        entry = json.loads(line)
+
+        if entry['paid'] != paid:
+            raise ValueError(f"The checkpoint {path} belongs to a {'paid' if entry['paid'] else 'free'} scrape run")
+
+        completed[entry['extension']] = [tuple(task) for task in entry['tasks']]
+
+    return completed
+
+
+"""
+* clear_checkpoint : This function removes the checkpoint file so that a new run starts from the beginning
+*
+* INPUTS
+* path (String) : The path of the checkpoint file
+*
+* OUTPUTS
+* None
+"""
+def clear_checkpoint(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+"""
+* record_lesson : This function adds a fully processed lesson to the checkpoint file
+*
+* INPUTS
+* path (String) : The path of the checkpoint file
+* extension (String) : The lesson extension from get_links
+* tasks (list[tuple]) : The tasks that were extracted from the lesson page
+* Optional paid (bool) : Specifies whether the lesson is a paid lesson
+*
+* OUTPUTS
+* None
+*
+* ADDITIONAL
+* The line is flushed to disk before returning, so a lesson is only skipped on resume once it is safely recorded
+"""
+def record_lesson(path, extension, tasks, paid=False):
+    entry = {'paid' : paid, 'extension' : extension, 'tasks' : tasks}
+
+    with open(path, "a", encoding="utf-8") as checkpoint_file:
+        checkpoint_file.write(json.dumps(entry) + "\n")
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
@@ -1,6 +1,9 @@
 import bs4
 from bs4 import BeautifulSoup
 
+# The class of the button links that point to an audio file
+AUDIO_BUTTON_CLASS = "wsite-button wsite-button-small wsite-button-normal"
+
 """
 * extract_paragraphs : This function extracts all of the paragraph content from the given node or any of the children nodes
 * 
@@ -11,8 +14,6 @@ from bs4 import BeautifulSoup
 * paragraph_content (Dict) : An object with the text content contained within the given node represented by the content object
 """
 def extract_paragraphs(content):
-    paragraph_object = {'type' : 'paragraph'}
-    paragraph_content = None
     paragraph_node = None
 
     # Look to see if the current content is a paragraph node
@@ -28,21 +29,36 @@ def extract_paragraphs(content):
     else:
         paragraph_node = content.find(class_='paragraph')
 
-    # * Insert '\n' characters where necessary
     if paragraph_node != None:
-        for br_tag in paragraph_node.find_all('br'):
-            br_tag.replace_with('\n')
-
-        paragraph_content = paragraph_node.get_text()
-        paragraph_object['content'] = paragraph_content
-        
         # Return the object {'type' : 'paragraph', 'content' : paragraph_text}
-        return paragraph_object
+        return build_paragraph(paragraph_node)
 
     # Otherwise return None
     return None
 
 
+"""
+* build_paragraph : This function creates the paragraph object for a node that is known to be a paragraph node
+* 
+* INPUTS
+* paragraph_node : The parsed HTML node of the paragraph
+* 
+* OUTPUTS
+* paragraph_object (Dict) : An object with the text content of the paragraph
+"""
+def build_paragraph(paragraph_node):
+    paragraph_object = {'type' : 'paragraph'}
+
+    # * Insert '\n' characters where necessary
+    for br_tag in paragraph_node.find_all('br'):
+        br_tag.replace_with('\n')
+
+    paragraph_object['content'] = paragraph_node.get_text()
+
+    # Return the object {'type' : 'paragraph', 'content' : paragraph_text}
+    return paragraph_object
+
+
 """
 * extract_videos : Extracts the embedded video links from the provided parsed HTML or from any of the children nodes
 * 
@@ -53,8 +69,6 @@ def extract_paragraphs(content):
 * video_content (Dict): An object containing the extracted video link
 """
 def extract_videos(content):
-    video_object = {'type' : 'video'}
-    video_content = None
     video_node = None
 
     # Look to see if the current content is a video node
@@ -68,7 +82,27 @@ def extract_videos(content):
     else:
         video_node = content.find('iframe')
     
-    if video_node != None and "http://vocaroo.com" not in video_node['src'] :
+    if video_node != None:
+        # Return the object {'type' : 'video', 'content' : video_link}
+        return build_video(video_node)
+
+    # Otherwise return None
+    return None
+
+
+"""
+* build_video : This function creates the video object for an iframe node
+* 
+* INPUTS
+* video_node : The parsed HTML iframe node
+* 
+* OUTPUTS
+* video_object (Dict) : An object containing the embedded video link, or None if the iframe is a vocaroo (audio) player
+"""
+def build_video(video_node):
+    video_object = {'type' : 'video'}
+
+    if "http://vocaroo.com" not in video_node['src'] :
         video_content = video_node['src']
         video_object['content'] = video_content if "https:" in video_content else "https:" + video_content
 
@@ -89,8 +123,6 @@ def extract_videos(content):
 * image_content (Dict) : An object containing the extracted image link
 """
 def extract_image(content):
-    image_object = {'type' : 'image'}
-    image_content = None
     image_node = None
 
     # Look to see if the current content is a video node
@@ -105,15 +137,31 @@ def extract_image(content):
         image_node = content.find('img')
     
     if image_node != None:
-        image_content = image_node['src']
-        image_object['content'] = "https://www.speechmodification.com" + image_content
-
-        # Return the object {'type' : 'video', 'content' : video_link}
-        return image_object
+        # Return the object {'type' : 'image', 'content' : image_link}
+        return build_image(image_node)
 
     # Otherwise return None
     return None
 
+
+"""
+* build_image : This function creates the image object for an img node
+* 
+* INPUTS
+* image_node : The parsed HTML img node
+* 
+* OUTPUTS
+* image_object (Dict) : An object containing the embedded image link
+"""
+def build_image(image_node):
+    image_object = {'type' : 'image'}
+
+    image_content = image_node['src']
+    image_object['content'] = "https://www.speechmodification.com" + image_content
+
+    # Return the object {'type' : 'image', 'content' : image_link}
+    return image_object
+
 """
 * extract_audio_type_1 : This function finds the embedded audio link from the provided content or any of the content's child node
 * Speficically for an linked audio player and not for an embedded player
@@ -125,33 +173,47 @@ def extract_image(content):
 * image_content (Dict) : An object containing the extracted audio link
 """
 def extract_audio_type_1(content):
-    audio_object = {'type' : 'audio'}
     audio_node = None
-    audio_content = None
     # For both the current node
     # -> Check if they contain either "wsite-button wsite-button-small wsite-button-normal"
     classes = content.get('class') 
     class_name = classes[0] if classes else None
 
-    if class_name != None and class_name == "wsite-button wsite-button-small wsite-button-normal":
+    if class_name != None and class_name == AUDIO_BUTTON_CLASS:
         audio_node = content
 
     # Check for the children as well
     else:
-        audio_node = content.find("a", class_="wsite-button wsite-button-small wsite-button-normal")
+        audio_node = content.find("a", class_=AUDIO_BUTTON_CLASS)
 
     if audio_node != None:
-        audio_content = audio_node['href']
-        audio_title = audio_node.get_text().rstrip()
-        audio_object['title'] = audio_title
-        audio_object['content'] = "https://www.speechmodification.com" + audio_content
-
         # Return {'type' : 'audio', 'title' : audio_title, 'content' : audio_link}
-        return audio_object
+        return build_audio_type_1(audio_node)
 
     # Otherwise return None
     return None
 
+
+"""
+* build_audio_type_1 : This function creates the audio object for a linked audio player (button) node
+* 
+* INPUTS
+* audio_node : The parsed HTML 'a' node of the audio button
+* 
+* OUTPUTS
+* audio_object (Dict) : An object containing the title and the link of the audio
+"""
+def build_audio_type_1(audio_node):
+    audio_object = {'type' : 'audio'}
+
+    audio_content = audio_node['href']
+    audio_title = audio_node.get_text().rstrip()
+    audio_object['title'] = audio_title
+    audio_object['content'] = "https://www.speechmodification.com" + audio_content
+
+    # Return {'type' : 'audio', 'title' : audio_title, 'content' : audio_link}
+    return audio_object
+
 """
 * extract_audio_type_2 : This function finds the embedded audio link from the provided content or any of the content's child node
 * Speficically for an embedded player
@@ -163,9 +225,7 @@ def extract_audio_type_1(content):
 * image_content (Dict) : An object containing the extracted audio link
 """
 def extract_audio_type_2(content):
-    audio_object = {'type' : 'audio'}
     audio_node = None
-    audio_content = None
 
     # For the given node check if it is an 'audio' node
     # -> Extract that link if so
@@ -178,18 +238,34 @@ def extract_audio_type_2(content):
         audio_node = content.find('audio')
 
     if audio_node != None:
-        audio_content = audio_node['src']
-        audio_title = " ".join(audio_content.split("/")[-1].split(".")[0].split("_"))
-        audio_object['title'] = audio_title
-        audio_object['content'] = "https://www.speechmodification.com" + audio_content
-
         # Return {'type' : 'audio', 'title' : audio_title, 'content' : audio_link}
-        return audio_object
+        return build_audio_type_2(audio_node)
 
     # Otherwise return None
     return None
 
 
+"""
+* build_audio_type_2 : This function creates the audio object for an embedded audio player node
+* 
+* INPUTS
+* audio_node : The parsed HTML 'audio' node
+* 
+* OUTPUTS
+* audio_object (Dict) : An object containing the title and the link of the audio
+"""
+def build_audio_type_2(audio_node):
+    audio_object = {'type' : 'audio'}
+
+    audio_content = audio_node['src']
+    audio_title = " ".join(audio_content.split("/")[-1].split(".")[0].split("_"))
+    audio_object['title'] = audio_title
+    audio_object['content'] = "https://www.speechmodification.com" + audio_content
+
+    # Return {'type' : 'audio', 'title' : audio_title, 'content' : audio_link}
+    return audio_object
+
+
 
 """
 * extract_table : This function creates an array of objects representing all of the sub-contents within a table element
@@ -209,12 +285,23 @@ def extract_table(content):
         {'type' : 'audio', 'content' : audio_link},
     ]
     """
-    table_object = {'type' : 'table'}
-    table_content_array = []
-
     # Find all of the 'td' (table data) nodes in the content object 
     # We want to extract the necessary information from each of these td objects
-    table_contents = content.find_all('td')
+    return build_table(content.find_all('td'))
+
+
+"""
+* build_table : This function creates the table object from the 'td' (table data) nodes of a table
+* 
+* INPUTS
+* table_contents (list) : The parsed HTML td nodes, in document order
+* 
+* OUTPUTS
+* table_object (Dict) : An object containing the array of extracted content objects, or None if nothing was found in the table
+"""
+def build_table(table_contents):
+    table_object = {'type' : 'table'}
+    table_content_array = []
 
     # For each of the td objects - look through their sub-nodes (children)
     # And try to extract one of the four different kinds of data from the td
@@ -222,35 +309,9 @@ def extract_table(content):
     # -> Therefore, we can just continue the loop through the tds
     for td in table_contents:
         for child in td.find_all(recursive=False):
-            # Extract a paragraph
-            paragraph_content = extract_paragraphs(child)
-            if paragraph_content != None:
-                table_content_array.append(paragraph_content)
-                continue
-
-            # Extract an audio link (of type class = 'wsite-button wsite-button-small wsite-button-normal')
-            audio_content_1 = extract_audio_type_1(child)
-            if audio_content_1 != None:
-                table_content_array.append(audio_content_1)
-                continue
-
-            # Extract an audio link (of type 'audio')
-            audio_content_2 = extract_audio_type_2(child)
-            if audio_content_2 != None:
-                table_content_array.append(audio_content_2)
-                continue
-
-            # Extract an image link
-            image_content = extract_image(child)
-            if image_content != None:
-                table_content_array.append(image_content)
-                continue
-
-            # Extract a video link
-            video_content = extract_videos(child)
-            if video_content != None:
-                table_content_array.append(video_content)
-                continue
+            child_content = classify_node(child, TABLE_CELL_ORDER)
+            if child_content != None:
+                table_content_array.append(child_content)
 
     # If there was anything added in the table, return the table object
     if len(table_content_array) > 0:
@@ -258,4 +319,119 @@ def extract_table(content):
         return table_object
     
     # Otherwise return None
-    return None
\ No newline at end of file
+    return None
+
+
+# The order in which the kinds of content are tried for a child of the blog content
+# -> The first kind that is found is the one that is returned
+BLOG_CONTENT_ORDER = ('table', 'video', 'image', 'audio_type_1', 'audio_type_2', 'paragraph')
+
+# The order in which the kinds of content are tried for a child of a table cell
+TABLE_CELL_ORDER = ('paragraph', 'audio_type_1', 'audio_type_2', 'image', 'video')
+
+
+"""
+* scan_node : This function walks the subtree of a node once and records the first descendant node of each kind of content
+* 
+* INPUTS
+* content : A parsed HTML node
+* Optional collect_tds (bool) : Specifies whether all of the 'td' descendants should be collected as well
+* 
+* OUTPUTS
+* found (Dict) : The first descendant node found for each kind of content ('paragraph', 'iframe', 'img', 'audio', 'audio_button')
+* tds (list) : All of the td descendants in document order (empty if collect_tds is False)
+*
+* ADDITIONAL
+* The nodes are the same ones that content.find() would return for each kind, since the descendants are visited in document order
+"""
+def scan_node(content, collect_tds=False):
+    found = {}
+    tds = []
+
+    for node in content.descendants:
+        if not isinstance(node, bs4.Tag):
+            continue
+
+        node_name = node.name
+        if node_name == 'td':
+            if collect_tds:
+                tds.append(node)
+        elif node_name == 'iframe' or node_name == 'img' or node_name == 'audio':
+            if node_name not in found:
+                found[node_name] = node
+
+        classes = node.get('class')
+        if classes:
+            # Same matching as find(class_='paragraph'), which checks each of the classes on the node
+            if 'paragraph' not in found and 'paragraph' in classes:
+                found['paragraph'] = node
+
+            # Same matching as find("a", class_=AUDIO_BUTTON_CLASS), which checks the whole class string
+            if node_name == 'a' and 'audio_button' not in found and " ".join(classes) == AUDIO_BUTTON_CLASS:
+                found['audio_button'] = node
+
+    return found, tds
+
+
+"""
+* classify_node : This function finds which kind of content a node holds and creates the matching content object
+* 
+* INPUTS
+* content : A parsed HTML node
+* Optional order (tuple) : The order in which the kinds of content are tried (BLOG_CONTENT_ORDER or TABLE_CELL_ORDER)
+* 
+* OUTPUTS
+* content_object (Dict) : The same object that the first successful extract_* function in the given order would return, or None
+*
+* ADDITIONAL
+* The extract_* functions each search the whole subtree of the node with find(). This function walks the subtree a single time
+* with scan_node() and then picks the result, so a node costs one scan instead of one per kind of content
+"""
+def classify_node(content, order=BLOG_CONTENT_ORDER):
+    found, tds = scan_node(content, collect_tds='table' in order)
+
+    node_name = content.name
+    classes = content.get('class')
+    class_name = classes[0] if classes else None
+
+    for kind in order:
+        content_object = None
+
+        if kind == 'table':
+            if tds:
+                content_object = build_table(tds)
+
+        elif kind == 'video':
+            video_node = content if node_name == 'iframe' else found.get('iframe')
+            if video_node != None:
+                content_object = build_video(video_node)
+
+        elif kind == 'image':
+            image_node = content if node_name == 'img' else found.get('img')
+            if image_node != None:
+                content_object = build_image(image_node)
+
+        elif kind == 'audio_type_1':
+            audio_node = content if class_name == AUDIO_BUTTON_CLASS else found.get('audio_button')
+            if audio_node != None:
+                content_object = build_audio_type_1(audio_node)
+
+        elif kind == 'audio_type_2':
+            audio_node = content if node_name == 'audio' else found.get('audio')
+            if audio_node != None:
+                content_object = build_audio_type_2(audio_node)
+
+        elif kind == 'paragraph':
+            if class_name == 'paragraph' or class_name == 'wsite-content-title':
+                paragraph_node = content
+            else:
+                paragraph_node = found.get('paragraph')
+
+            if paragraph_node != None:
+                content_object = build_paragraph(paragraph_node)
+
+        if content_object != None:
+            return content_object
+
+    # Otherwise return None
+    return None
@@ -0,0 +1,216 @@
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import hashlib
+import json
+import os
+import threading
+
+# The default number of pages that are allowed to be in flight at the same time
+# Keep this small so that we don't hammer the origin server
+DEFAULT_MAX_WORKERS = 4
+
+# The number of seconds to wait for the server to connect and to send data, so a stuck connection can't hold a worker forever
+DEFAULT_TIMEOUT = 30
+
+
+"""
+* create_session : This function creates a requests session that keeps its connections alive between requests
+*
+* INPUTS
+* Optional max_workers (int) : The number of threads that will be sharing the session
+*
+* OUTPUTS
+* session (requests.Session) : A session whose connection pool is large enough for every worker
+"""
+def create_session(max_workers=DEFAULT_MAX_WORKERS):
+    session = requests.Session()
+
+    # Size the connection pool so that every worker can hold on to its own keep-alive connection
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+"""
+* cache_paths : This function finds where the cached copy of a page is stored on disk
+*
+* INPUTS
+* cache_dir (String) : The directory that holds the response cache
+* url (String) : The url of the page
+*
+* OUTPUTS
+* html_path, meta_path (tuple) : The paths of the cached HTML and of its metadata (url, ETag, Last-Modified)
+"""
+def cache_paths(cache_dir, url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, key + ".html"), os.path.join(cache_dir, key + ".json")
+
+
+"""
+* load_cached_page : This function reads the cached copy of a page from disk
+*
+* INPUTS
+* cache_dir (String) : The directory that holds the response cache
+* url (String) : The url of the page
+*
+* OUTPUTS
+* html, meta (tuple) : The cached HTML and its metadata, or (None, None) if the page has not been cached
+"""
+def load_cached_page(cache_dir, url):
+    html_path, meta_path = cache_paths(cache_dir, url)
+
+    try:
+        with open(meta_path, encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+        with open(html_path, encoding="utf-8") as html_file:
+            html = html_file.read()
+    except (OSError, ValueError):
+        return None, None
+
+    return html, meta
+
+
+"""
+* store_cached_page : This function writes a page and its validators to the response cache
+*
+* INPUTS
+* cache_dir (String) : The directory that holds the response cache
+* url (String) : The url of the page
+* html (String) : The HTML text of the page
+* Optional headers (dict) : The response headers. The ETag and Last-Modified headers are kept for later conditional requests
+*
+* OUTPUTS
+* None
+*
+* ADDITIONAL
+* Both files are written to a temporary path first and then moved into place,
+* so a crash or a concurrent reader never sees a half written page
+"""
+def store_cached_page(cache_dir, url, html, headers=None):
+    os.makedirs(cache_dir, exist_ok=True)
+    html_path, meta_path = cache_paths(cache_dir, url)
+    headers = headers or {}
+
+    meta = {
+        'url' : url,
+        'etag' : headers.get('ETag'),
+        'last_modified' : headers.get('Last-Modified'),
+    }
+
+    for path, data in ((html_path, html), (meta_path, json.dumps(meta))):
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
+
+
+"""
+* fetch_page : This function downloads the HTML of a single page
+*
+* INPUTS
+* url (String) : The url of the page to download
+* Optional session (requests.Session) : The session used to make the request. A bare requests.get is used if not given
+* Optional cache_dir (String) : A directory used as an on-disk response cache
+* Optional offline (bool) : Only read the page from the cache and never touch the network
+* Optional timeout (int) : The number of seconds to wait for the server
+*
+* OUTPUTS
+* html (String) : The HTML text of the page
+*
+* ADDITIONAL
+* When a cached copy exists, its ETag and Last-Modified values are sent back as If-None-Match and If-Modified-Since
+* so that an unchanged page costs a 304 response instead of a full download.
+* An error response raises requests.HTTPError instead of handing back the body of the error page
+"""
+def fetch_page(url, session=None, cache_dir=None, offline=False, timeout=DEFAULT_TIMEOUT):
+    cached_html, meta = None, None
+    if cache_dir != None:
+        cached_html, meta = load_cached_page(cache_dir, url)
+
+    # In offline mode the cache is the only source of pages
+    if offline == True:
+        if cached_html == None:
+            raise FileNotFoundError(f"No cached copy of {url} (offline mode)")
+        return cached_html
+
+    # Ask the server to only send the page back if it has changed
+    headers = {}
+    if cached_html != None:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    if session == None:
+        page = requests.get(url, headers=headers, timeout=timeout)
+    else:
+        page = session.get(url, headers=headers, timeout=timeout)
+
+    if page.status_code == 304 and cached_html != None:
+        return cached_html
+
+    # Never parse an error page as a lesson
+    page.raise_for_status()
+
+    if cache_dir != None and page.status_code == 200:
+        store_cached_page(cache_dir, url, page.text, page.headers)
+
+    return page.text
+
+
+"""
+* fetch_pages : This function downloads a list of pages using a bounded pool of worker threads
+*
+* INPUTS
+* urls (list[String]) : The urls of the pages to download
+* Optional max_workers (int) : The maximum number of pages that are downloaded at the same time
+* Optional session (requests.Session) : A shared session to use for the requests. One is created if not given
+* Optional cache_dir (String) : A directory used as an on-disk response cache
+* Optional offline (bool) : Only read the pages from the cache and never touch the network
+*
+* OUTPUTS
+* (generator) : Yields the HTML text of each page in the same order as the given urls
+*
+* ADDITIONAL
+* Only a limited window of pages is kept in flight so that memory does not grow with the number of urls,
+* while the pages further ahead keep downloading as the caller works through the earlier ones
+"""
+def fetch_pages(urls, max_workers=DEFAULT_MAX_WORKERS, session=None, cache_dir=None, offline=False):
+    urls = iter(urls)
+
+    # Fetch the pages one at a time if there is no concurrency to be gained
+    # Reading from the cache alone is not worth spreading across threads either
+    if max_workers <= 1 or offline == True:
+        for url in urls:
+            yield fetch_page(url, session, cache_dir, offline)
+        return
+
+    owns_session = session == None
+    if owns_session:
+        session = create_session(max_workers)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Queue up the first window of requests
+            in_flight = deque()
+            for url in urls:
+                in_flight.append(executor.submit(fetch_page, url, session, cache_dir))
+                if len(in_flight) >= max_workers * 2:
+                    break
+
+            # Hand back the pages in order and top the window up as each one is consumed
+            while in_flight:
+                html = in_flight.popleft().result()
+
+                next_url = next(urls, None)
+                if next_url != None:
+                    in_flight.append(executor.submit(fetch_page, next_url, session, cache_dir))
+
+                yield html
+
+    finally:
+        if owns_session:
+            session.close()
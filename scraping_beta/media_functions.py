@@ -0,0 +1,193 @@
+import json
+import os
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from scraping_beta import fetch_functions
+
+# The content types that link to a media file
+MEDIA_TYPES = ('audio', 'image', 'video')
+
+# The number of seconds to wait for a media server to answer
+DEFAULT_TIMEOUT = 10
+
+
+"""
+* collect_media_urls : This function finds all of the media links in the content of a task
+*
+* INPUTS
+* task_content (list or String) : The content objects of a task, or their JSON text
+*
+* OUTPUTS
+* urls (list[String]) : The audio, image and video links of the task in order (tables included), without duplicates
+"""
+def collect_media_urls(task_content):
+    if isinstance(task_content, str):
+        task_content = json.loads(task_content)
+
+    urls = []
+    for content_object in task_content:
+        # Look through the content of a table as well
+        if content_object['type'] == 'table':
+            nested_urls = collect_media_urls(content_object['content'])
+            urls.extend(url for url in nested_urls if url not in urls)
+
+        elif content_object['type'] in MEDIA_TYPES and content_object['content'] not in urls:
+            urls.append(content_object['content'])
+
+    return urls
+
+
+"""
+* check_media_url : This function asks the server for the headers of a media link without downloading it
+*
+* INPUTS
+* url (String) : The media link
+* Optional session (requests.Session) : The session used to make the request
+* Optional timeout (int) : The number of seconds to wait for the server
+*
+* OUTPUTS
+* media_info (dict) : The content type, the size in bytes (None if unknown), the HTTP status and whether the link is reachable
+*
+* ADDITIONAL
+* Some servers do not answer HEAD requests, in which case a streamed GET is made and closed before the body is read
+"""
+def check_media_url(url, session=None, timeout=DEFAULT_TIMEOUT):
+    session = session or requests
+
+    try:
+        response = session.head(url, allow_redirects=True, timeout=timeout)
+        if response.status_code in (403, 405, 501):
+            response = session.get(url, allow_redirects=True, timeout=timeout, stream=True)
+            response.close()
+
+    except requests.RequestException as error:
+        return {'content_type' : None, 'size' : None, 'status' : None, 'reachable' : False, 'error' : str(error)}
+
+    content_length = response.headers.get('Content-Length')
+
+    return {
+        'content_type' : response.headers.get('Content-Type'),
+        'size' : int(content_length) if content_length and content_length.isdigit() else None,
+        'status' : response.status_code,
+        'reachable' : response.status_code < 400,
+    }
+
+
+"""
+* check_media_urls : This function checks a list of media links concurrently with a bounded pool of worker threads
+*
+* INPUTS
+* urls (list[String]) : The media links to check
+* Optional cache (dict) : Results of earlier checks keyed by url. Links found in it are not checked again and new results are added to it
+* Optional max_workers (int) : The maximum number of links that are checked at the same time
+* Optional session (requests.Session) : A shared session to use for the requests. One is created if not given
+*
+* OUTPUTS
+* cache (dict) : The media information of every link, keyed by url
+"""
+def check_media_urls(urls, cache=None, max_workers=fetch_functions.DEFAULT_MAX_WORKERS, session=None):
+    cache = {} if cache == None else cache
+    unchecked_urls = list(dict.fromkeys(url for url in urls if url not in cache))
+
+    if len(unchecked_urls) == 0:
+        return cache
+
+    owns_session = session == None
+    if owns_session:
+        session = fetch_functions.create_session(max_workers)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            results = executor.map(lambda url: check_media_url(url, session), unchecked_urls)
+            for url, media_info in zip(unchecked_urls, results):
+                cache[url] = media_info
+
+    finally:
+        if owns_session:
+            session.close()
+
+    return cache
+
+
+"""
+* build_manifest : This function creates the media manifest of a task
+*
+* INPUTS
+* task_content (list or String) : The content objects of a task, or their JSON text
+* media_cache (dict) : The media information of the links, keyed by url
+*
+* OUTPUTS
+* manifest (dict) : The media information of every link in the task, keyed by url
+"""
+def build_manifest(task_content, media_cache):
+    return {url: media_cache[url] for url in collect_media_urls(task_content) if url in media_cache}
+
+
+"""
+* attach_media_manifests : This function adds a media manifest to every scraped task
+*
+* INPUTS
+* lessons (iterable[list[tuple]]) : The scraped tasks, one list of (lesson_title, task_title, content) tuples per lesson
+*   -> This can be the generator returned by scraping_main.scrape_lessons
+* Optional cache (dict) : Results of earlier checks keyed by url, shared across the lessons
+* Optional max_workers (int) : The maximum number of links that are checked at the same time
+*
+* OUTPUTS
+* (generator) : Yields one list per lesson of (lesson_title, task_title, content, manifest) tuples
+*
+* ADDITIONAL
+* The links of a whole lesson are checked together, so the pool stays busy while each lesson is still handed on as soon as it is done
+"""
+def attach_media_manifests(lessons, cache=None, max_workers=fetch_functions.DEFAULT_MAX_WORKERS):
+    cache = {} if cache == None else cache
+    session = fetch_functions.create_session(max_workers)
+
+    try:
+        for lesson_tasks in lessons:
+            lesson_urls = [url for task in lesson_tasks for url in collect_media_urls(task[2])]
+            check_media_urls(lesson_urls, cache, max_workers, session)
+
+            yield [(task[0], task[1], task[2], build_manifest(task[2], cache)) for task in lesson_tasks]
+
+    finally:
+        session.close()
+
+
+"""
+* load_media_cache : This function reads the results of earlier media checks from disk
+*
+* INPUTS
+* path (String) : The path of the JSON cache file
+*
+* OUTPUTS
+* cache (dict) : The media information keyed by url (empty if the file does not exist yet)
+"""
+def load_media_cache(path):
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, encoding="utf-8") as cache_file:
+        return json.load(cache_file)
+
+
+"""
+* save_media_cache : This function writes the results of the media checks to disk for the next run
+*
+* INPUTS
+* path (String) : The path of the JSON cache file
+* cache (dict) : The media information keyed by url
+*
+* OUTPUTS
+* None
+*
+* ADDITIONAL
+* Links that could not be reached are left out so that they are checked again next time
+"""
+def save_media_cache(path, cache):
+    reachable = {url: media_info for url, media_info in cache.items() if media_info.get('reachable')}
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as cache_file:
+        json.dump(reachable, cache_file)
+    os.replace(temp_path, path)
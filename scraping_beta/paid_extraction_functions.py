@@ -3,23 +3,66 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-import time
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+from scraping_beta import fetch_functions
 
 from dotenv import load_dotenv
 from os import getenv
+import re
+
+
 
+# The maximum number of seconds to wait for the login to go through
+DEFAULT_LOGIN_TIMEOUT = 30
+
+# The name of the password field of the login form
+LOGIN_PASSWORD_FIELD = "login-password"
+
+# Finds the password field of the login form in the raw HTML of a page
+LOGIN_FORM_PATTERN = re.compile(r'name\s*=\s*["\']?' + LOGIN_PASSWORD_FIELD + r'\b')
+
+
+"""
+* logged_in : This function creates a wait condition that only holds once the browser shows a page of a logged in member
+* 
+* INPUTS
+* login_url (String) : The url of the login page
+* 
+* OUTPUTS
+* condition (function) : Takes the driver and returns True once a fully loaded page other than the login page is shown without a login form
+*
+* ADDITIONAL
+* Leaving the login page is not enough on its own. A failed login also submits the form and reloads the page,
+* so only a loaded page without the password field counts as logged in
+"""
+def logged_in(login_url):
+    def condition(driver):
+        if driver.current_url.split('?')[0].rstrip('/') == login_url.rstrip('/'):
+            return False
+        if driver.execute_script("return document.readyState") != "complete":
+            return False
+        return len(driver.find_elements(By.NAME, LOGIN_PASSWORD_FIELD)) == 0
+
+    return condition
 
 
 """
 * access_blocked_content : This function creates a selenium driver so to use for scraping of paid content
 * 
 * INPUTS
-* None
+* Optional login_timeout (int) : The maximum number of seconds to wait for the login to complete
 * 
 * OUTPUTS
-* None
+* driver : A selenium driver that is logged in to the website
+*
+* ADDITIONAL
+* The login counts as complete once the browser shows a member page without the login form (see logged_in),
+* so there is no fixed wait after submitting the credentials. A RuntimeError is raised if that page never shows up,
+* so that a failed login never goes on to scrape the login page in place of the paid lessons
 """
-def access_blocked_content():
+def access_blocked_content(login_timeout=DEFAULT_LOGIN_TIMEOUT):
     login_url = 'https://www.speechmodification.com/apps/member/login'
 
     load_dotenv()
@@ -40,12 +83,84 @@ def access_blocked_content():
 
     # Enter login credentials
     username = driver.find_element(By.NAME, "login-email")
-    password = driver.find_element(By.NAME, "login-password")
+    password = driver.find_element(By.NAME, LOGIN_PASSWORD_FIELD)
 
     username.send_keys(login_email)
     password.send_keys(login_password)
     password.send_keys(Keys.RETURN)
 
-    time.sleep(5)  # Give time for authentication
+    # Give time for authentication
+    try:
+        WebDriverWait(driver, login_timeout).until(logged_in(login_url))
+
+    except TimeoutException:
+        current_url = driver.current_url
+        driver.quit()
+        raise RuntimeError(f"Could not log in to the website within {login_timeout} seconds (still on {current_url}). Check LOGIN_EMAIL and LOGIN_PASSWORD")
+
+    return driver
+
+
+"""
+* session_from_driver : This function copies the cookies of a logged in selenium driver into a requests session
+* 
+* INPUTS
+* driver : A selenium driver that is logged in to the website
+* Optional max_workers (int) : The number of threads that will be sharing the session
+* 
+* OUTPUTS
+* session (requests.Session) : A keep-alive session that is authenticated the same way as the browser
+*
+* ADDITIONAL
+* This lets the paid pages be downloaded concurrently over plain HTTP, with the browser only being used to log in
+"""
+def session_from_driver(driver, max_workers=fetch_functions.DEFAULT_MAX_WORKERS):
+    session = fetch_functions.create_session(max_workers)
+
+    # Some sites tie the session to the browser, so send the same user agent
+    session.headers['User-Agent'] = driver.execute_script("return navigator.userAgent")
+
+    for cookie in driver.get_cookies():
+        session.cookies.set(
+            cookie['name'],
+            cookie['value'],
+            domain=cookie.get('domain'),
+            path=cookie.get('path', '/'),
+            secure=cookie.get('secure', False),
+        )
+
+    return session
 
-    return driver
\ No newline at end of file
+
+"""
+* is_login_page : This function checks whether a downloaded page is the login form instead of the page that was asked for
+* 
+* INPUTS
+* html (String) : The HTML text of the page
+* 
+* OUTPUTS
+* login_page (bool) : True if the page holds the password field of the login form (the same signal that logged_in waits on)
+"""
+def is_login_page(html):
+    return LOGIN_FORM_PATTERN.search(html) != None
+
+
+"""
+* require_logged_in : This function passes paid pages on, and stops the crawl at the first page that turns out to be the login form
+* 
+* INPUTS
+* pages (iterable[String]) : The HTML text of the paid pages
+* urls (list[String]) : The url of each page
+* 
+* OUTPUTS
+* (generator) : Yields the HTML text of each page
+*
+* ADDITIONAL
+* Once the cookies expire, the website answers with the login form instead of the lesson. It would parse as a lesson without
+* any tasks and get every task of the lesson flagged as removed, so a RuntimeError is raised instead
+"""
+def require_logged_in(pages, urls):
+    for html, url in zip(pages, urls):
+        if is_login_page(html):
+            raise RuntimeError(f"Got the login page instead of {url}. The login has expired, so the paid crawl is stopped")
+        yield html
@@ -0,0 +1,74 @@
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+
+# The HTML parser backends that can be used to build the documents
+# -> "lxml" is much faster on large pages but needs the optional lxml package to be installed
+PARSER_BACKENDS = ("html.parser", "lxml")
+DEFAULT_PARSER = "html.parser"
+
+# Only the blog posts are read from a lesson page
+LESSON_PAGE_STRAINER = SoupStrainer(class_="blog-post")
+
+# Only the category list is read from a page of lesson links
+LINKS_PAGE_STRAINER = SoupStrainer(class_="blog-category-list")
+
+
+"""
+* check_parser : This function makes sure that the given parser backend can be used
+*
+* INPUTS
+* parser (String) : The name of the parser backend
+*
+* OUTPUTS
+* None
+"""
+def check_parser(parser):
+    if parser not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend '{parser}'. Choose one of {', '.join(PARSER_BACKENDS)}")
+
+    if builder_registry.lookup(parser) == None:
+        raise ValueError(f"The '{parser}' parser backend is not installed (pip install {parser})")
+
+
+"""
+* parse_html : This function builds a Beautifulsoup document from the given HTML
+*
+* INPUTS
+* html (String) : The HTML text of a page
+* Optional parser (String) : The parser backend used to build the document (see PARSER_BACKENDS)
+* Optional parse_only (SoupStrainer) : Only the parts of the page matching the strainer (and their subtrees) are built
+*
+* OUTPUTS
+* doc : a Beautifulsoup HTML document object
+"""
+def parse_html(html, parser=DEFAULT_PARSER, parse_only=None):
+    check_parser(parser)
+    return BeautifulSoup(html, parser, parse_only=parse_only)
+
+
+"""
+* parse_lesson_page : This function builds a document holding only the blog posts of a lesson page
+*
+* INPUTS
+* html (String) : The HTML text of a lesson page
+* Optional parser (String) : The parser backend used to build the document
+*
+* OUTPUTS
+* doc : a Beautifulsoup HTML document object
+"""
+def parse_lesson_page(html, parser=DEFAULT_PARSER):
+    return parse_html(html, parser, LESSON_PAGE_STRAINER)
+
+
+"""
+* parse_links_page : This function builds a document holding only the lesson category list of a page
+*
+* INPUTS
+* html (String) : The HTML text of a page with the lesson links
+* Optional parser (String) : The parser backend used to build the document
+*
+* OUTPUTS
+* doc : a Beautifulsoup HTML document object
+"""
+def parse_links_page(html, parser=DEFAULT_PARSER):
+    return parse_html(html, parser, LINKS_PAGE_STRAINER)
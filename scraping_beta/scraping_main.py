@@ -1,10 +1,12 @@
 import bs4
-from bs4 import BeautifulSoup
-import requests
-import json
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 
 from scraping_beta import extraction_functions
 from scraping_beta import paid_extraction_functions
+from scraping_beta import fetch_functions
+from scraping_beta import parsing_functions
+from scraping_beta import checkpoint_functions
 
 """
 * get_links : This function goes through the given document and extracts the links and names of different pages on the website
@@ -39,18 +41,20 @@ def get_links(doc):
 * get_free_links : This function extracts all of the (free) lesson names and links from the home page of the website
 * 
 * INPUTS
-* None
+* Optional cache_dir (String) : A directory used as an on-disk response cache
+* Optional offline (bool) : Only read the page from the cache and never touch the network
+* Optional parser (String) : The HTML parser backend (see parsing_functions.PARSER_BACKENDS)
 * 
 * OUTPUTS
 * lesson_object (dict) : A dictionary containing two arrays: An array of lesson names and then an array of links
 * -> Each index of both arrays matach a lesson name to their corresponding link
 """
-def get_free_links():
+def get_free_links(cache_dir=None, offline=False, parser=parsing_functions.DEFAULT_PARSER):
     # Extract the HTML from the main lesson page of the website
     extension = "/free"
     url = f"https://www.speechmodification.com{extension}"
-    page = requests.get(url)
-    doc = BeautifulSoup(page.text, "html.parser")
+    html = fetch_functions.fetch_page(url, cache_dir=cache_dir, offline=offline)
+    doc = parsing_functions.parse_links_page(html, parser)
 
     return get_links(doc)
 
@@ -58,124 +62,271 @@ def get_free_links():
 * get_paid_links : This function extracts all of the (paid) lesson names and links from the home page of the website
 * 
 * INPUTS
-* None
+* Optional cache_dir (String) : A directory used as an on-disk response cache
+* Optional offline (bool) : Only read the page from the cache. No browser is started in this case
+* Optional parser (String) : The HTML parser backend (see parsing_functions.PARSER_BACKENDS)
 * 
 * OUTPUTS
 * lesson_object (dict) : A dictionary containing two arrays: An array of lesson names and then an array of links
 * -> Each index of both arrays matach a lesson name to their corresponding link
+* driver : The logged in selenium driver (None in offline mode)
 """
-def get_paid_links():
+def get_paid_links(cache_dir=None, offline=False, parser=parsing_functions.DEFAULT_PARSER):
+    url = "https://www.speechmodification.com/online-practice"
+
+    # Replay the lesson list from the cache without logging in
+    if offline == True:
+        html = fetch_functions.fetch_page(url, cache_dir=cache_dir, offline=True)
+        return get_links(parsing_functions.parse_links_page(html, parser)), None
+
     driver = paid_extraction_functions.access_blocked_content()
-    driver.get("https://www.speechmodification.com/online-practice")
-    doc = BeautifulSoup(driver.page_source, "html.parser")
+    html = page_source(driver, url, cache_dir)
+    if paid_extraction_functions.is_login_page(html):
+        driver.quit()
+        raise RuntimeError(f"Got the login page instead of {url}")
+
+    doc = parsing_functions.parse_links_page(html, parser)
 
     return get_links(doc), driver
 
 
+"""
+* page_source : This function loads a page in the (logged in) selenium driver and returns its HTML
+* 
+* INPUTS
+* driver : A selenium driver
+* url (String) : The url of the page to load
+* Optional cache_dir (String) : A directory used as an on-disk response cache. The page is saved there for offline replay
+* 
+* OUTPUTS
+* html (String) : The HTML of the loaded page
+"""
+def page_source(driver, url, cache_dir=None):
+    driver.get(url)
+    html = driver.page_source
+
+    if cache_dir != None:
+        fetch_functions.store_cached_page(cache_dir, url, html)
+
+    return html
+
+
+
+"""
+* extract_tasks : This function extracts all of the tasks from the parsed HTML of a single lesson page
+* 
+* INPUTS
+* doc : a Beautifulsoup HTML document object of a lesson page
+* lesson_title (String) : The title of the lesson that the page belongs to
+* 
+* OUTPUTS
+* task_array (List) : A list of tuples where each tuple contains the lesson name, task title and task content extracted from the page
+* -> The task content is the list of content objects itself, so it is only encoded once when it is written to the database
+"""
+def extract_tasks(doc, lesson_title):
+    task_array = []
+
+    # Get each of the blog posts from the page
+    blog_posts = doc.find_all(class_="blog-post")
+
+    ## *** Iterate through each of the blog posts on the page ***
+    for task in blog_posts:
+        # Get the HTML of the specific blog post
+        content = task.find(class_='blog-content')
+
+        # Extract the title of the task from the blog post
+        task_title = task.find(class_='blog-title').text.strip()
+        task_content = []
+
+        for child in content.children:
+            if isinstance(child, bs4.Tag):
+                # Find which kind of data the div holds with a single walk over it
+                # The kinds are tried in the order table, video, image, audio (button), audio (player), paragraph
+                child_content = extraction_functions.classify_node(child)
+                if child_content != None:
+                    task_content.append(child_content)
+        
+        # Append a tuple representing a specific task to the overall task array
+        task_array.append((lesson_title, task_title, task_content,))
+
+    return task_array
+
+
+"""
+* extract_page : This function parses the HTML of a lesson page and extracts its tasks
+* 
+* INPUTS
+* html (String) : The HTML text of a lesson page
+* lesson_title (String) : The title of the lesson that the page belongs to
+* Optional parser (String) : The HTML parser backend (see parsing_functions.PARSER_BACKENDS)
+* 
+* OUTPUTS
+* task_array (List) : A list of tuples where each tuple contains the lesson name, task title and task content extracted from the page
+* -> The task content is the list of content objects itself, so it is only encoded once when it is written to the database
+*
+* ADDITIONAL
+* This only takes and returns plain values, so that it can be run in a worker process
+"""
+def extract_page(html, lesson_title, parser=parsing_functions.DEFAULT_PARSER):
+    # Only the blog posts of the page are built into the document
+    doc = parsing_functions.parse_lesson_page(html, parser)
+    return extract_tasks(doc, lesson_title)
+
+
+"""
+* extract_pages_parallel : This function parses and extracts lesson pages in a pool of worker processes
+* 
+* INPUTS
+* pages (iterable[String]) : The HTML text of the lesson pages
+* lesson_titles (list[String]) : The title of the lesson that each page belongs to
+* processes (int) : The number of worker processes
+* Optional parser (String) : The HTML parser backend (see parsing_functions.PARSER_BACKENDS)
+* 
+* OUTPUTS
+* (generator) : Yields the task list of each page in the same order as the pages
+*
+* ADDITIONAL
+* Parsing and extraction are CPU bound, so spreading the pages over processes lets them use more than one core.
+* Only a limited window of pages is handed to the pool at a time, so the pages are not all held in memory at once
+"""
+def extract_pages_parallel(pages, lesson_titles, processes, parser=parsing_functions.DEFAULT_PARSER):
+    work = zip(pages, lesson_titles)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        # Queue up the first window of pages
+        in_flight = deque()
+        for html, lesson_title in work:
+            in_flight.append(executor.submit(extract_page, html, lesson_title, parser))
+            if len(in_flight) >= processes * 2:
+                break
+
+        # Hand back the tasks in order and top the window up as each page is consumed
+        while in_flight:
+            lesson_tasks = in_flight.popleft().result()
+
+            next_page = next(work, None)
+            if next_page != None:
+                in_flight.append(executor.submit(extract_page, next_page[0], next_page[1], parser))
+
+            yield lesson_tasks
+
 
 """
 * scrape_lessons : This scrapes all of the lessons from the web page and formats their respective tasks for database insertion
 * 
 * INPUTS
-* None
+* Optional paid (bool) : Specifies whether the paid lessons should be scraped instead of the free lessons
+* Optional max_workers (int) : The maximum number of (free) lesson pages that are downloaded at the same time
+* Optional cache_dir (String) : A directory used as an on-disk response cache
+* Optional offline (bool) : Only parse the pages that are already in the cache and never touch the network
+* Optional parser (String) : The HTML parser backend (see parsing_functions.PARSER_BACKENDS)
+* Optional http_session (bool) : Download the paid pages concurrently over HTTP with the browser's cookies instead of through the browser
+* Optional checkpoint_path (String) : A file where every fully processed lesson that produced tasks is recorded together with them
+* Optional resume (bool) : Skip the lessons recorded in the checkpoint file instead of starting the checkpoint over
+* Optional processes (int) : The number of worker processes used to parse and extract the pages (1 keeps the work in this process)
+* Optional lesson_object (dict) : The lesson links, as returned by get_free_links or get_paid_links. They are looked up if not given
+* Optional driver : The logged in selenium driver returned by get_paid_links together with lesson_object
+*   -> the caller stays in charge of closing a driver it passes in, so the paid lessons only need one login
 * 
 * OUTPUTS
-* lesson_array (List) : This is a list of tuples where each tuple contains the lesson name, task title and task content extracted from the website
+* (generator) : Yields one list per lesson, holding a tuple for each task with the lesson name, task title and task content extracted from the website
+*
+* ADDITIONAL
+* Free lesson pages are downloaded concurrently over a shared keep-alive session when max_workers is greater than one.
+* The pages are still extracted in the same order as the lesson links, so the output does not change.
+* With a cache directory, unchanged free pages are revalidated with conditional requests instead of downloaded again.
+* Since the lessons are yielded as soon as they are extracted, the caller can store them while the next pages are still downloading.
+* With http_session, the browser is only used to log in and is closed before the paid pages are downloaded.
+* A paid page that comes back as the login form stops the crawl with a RuntimeError (see paid_extraction_functions.require_logged_in).
+* When resuming, the tasks of the lessons found in the checkpoint are yielded again from the file (in their usual place)
+* without their pages being downloaded, so the caller still receives every lesson
 """
-def scrape_lessons(paid=False):
+def scrape_lessons(paid=False, max_workers=fetch_functions.DEFAULT_MAX_WORKERS, cache_dir=None, offline=False, parser=parsing_functions.DEFAULT_PARSER, http_session=False, checkpoint_path=None, resume=False, processes=1, lesson_object=None, driver=None):
     """
-    Example return object:
+    Example yielded lists:
     [
         ('All', 'Learning P Sounds', [{...}, {...}]),
         ('All', 'Learning /z/ Sounds', [{...}, {...}]),
+    ]
+    [
         ('French', 'The r Sounds, [{...}, {...}])
     ]
     """
     # Get the names of the lessons from the website and their corresponding links
-    lesson_object = None
-    driver = None
-    if paid == True:
-        lesson_object, driver = get_paid_links()
-    else:
-        lesson_object = get_free_links()
+    owns_driver = lesson_object == None
+    if lesson_object == None:
+        if paid == True:
+            lesson_object, driver = get_paid_links(cache_dir, offline, parser)
+        else:
+            lesson_object = get_free_links(cache_dir, offline, parser)
 
     lesson_extensions = lesson_object['lesson_extensions']
     lesson_names = lesson_object['lesson_names']    
 
-    # This is the list that will be returned
-    # It will hold tuples each representing a task associated with a specific lesson
-    lesson_array = []
+    # Find the lessons that were already finished by an earlier run
+    completed = {}
+    if checkpoint_path != None:
+        if resume == True:
+            completed = checkpoint_functions.load_checkpoint(checkpoint_path, paid)
+        else:
+            checkpoint_functions.clear_checkpoint(checkpoint_path)
 
-    # Go through the different links and scrape their content
-    for i in range(len(lesson_names)):
-        extension = lesson_extensions[i]
-        lesson_title = lesson_names[i][0]
+    # Only the pages of the unfinished lessons need to be downloaded
+    urls = [f"https://www.speechmodification.com{extension}" for extension in lesson_extensions if extension not in completed]
 
-        url = f"https://www.speechmodification.com{extension}"
-        doc = None
-        if paid == True:
-            driver.get(url)
-            doc = BeautifulSoup(driver.page_source, "html.parser")
-        else:
-            page = requests.get(url)
-            doc = BeautifulSoup(page.text, "html.parser")
-
-
-        # Get each of the blog posts from the page
-        blog_posts = doc.find_all(class_="blog-post")
-
-        ## *** Iterate through each of the blog posts on the page ***
-        for task in blog_posts:
-            # Get the HTML of the specific blog post
-            content = task.find(class_='blog-content')
-
-            # Extract the title of the task from the blog post
-            task_title = task.find(class_='blog-title').text.strip()
-            task_content = []
-
-            for child in content.children:
-                if isinstance(child, bs4.Tag):
-                    # Try to extract each kind of data from each div
-                    # If one returns something, then I don't want to try to extract any other kinds of data
-
-                    # # Extract table content
-                    table_content = extraction_functions.extract_table(child)
-                    if table_content != None:
-                        task_content.append(table_content)
-                        continue
-
-                    # Extract a video link
-                    video_content = extraction_functions.extract_videos(child)
-                    if video_content != None:
-                        task_content.append(video_content)
-                        continue
-
-                    # Extract an image link
-                    image_content = extraction_functions.extract_image(child)
-                    if image_content != None:
-                        task_content.append(image_content)
-                        continue
-
-                    # Extract an audio link (of type class = 'wsite-button wsite-button-small wsite-button-normal')
-                    audio_content_1 = extraction_functions.extract_audio_type_1(child)
-                    if audio_content_1 != None:
-                        task_content.append(audio_content_1)
-                        continue
-
-                    # Extract an audio link (of type 'audio')
-                    audio_content_2 = extraction_functions.extract_audio_type_2(child)
-                    if audio_content_2 != None:
-                        task_content.append(audio_content_2)
-                        continue
-
-                    # Extract a paragraph
-                    paragraph_content = extraction_functions.extract_paragraphs(child)
-                    if paragraph_content != None:
-                        task_content.append(paragraph_content)
-                        continue
-            
-            # Append a tuple representing a specific task to the overall lesson array
-            lesson_array.append((lesson_title, task_title, json.dumps(task_content),))
-    
-    # Return the array of lessons / tasks
-    return lesson_array
\ No newline at end of file
+    pages = None
+    session = None
+    if paid == True and offline == False and http_session == True:
+        # Hand the login over to a plain HTTP session and close the browser
+        session = paid_extraction_functions.session_from_driver(driver, max_workers)
+        if owns_driver:
+            driver.quit()
+            driver = None
+
+        pages = fetch_functions.fetch_pages(urls, max_workers=max_workers, session=session, cache_dir=cache_dir)
+
+    elif paid == True and offline == False:
+        # Otherwise the paid pages have to be loaded one at a time through the logged in browser
+        pages = (page_source(driver, url, cache_dir) for url in urls)
+
+    else:
+        pages = fetch_functions.fetch_pages(urls, max_workers=max_workers, cache_dir=cache_dir, offline=offline)
+
+    # Never hand on the login form in place of a paid lesson
+    if paid == True:
+        pages = paid_extraction_functions.require_logged_in(pages, urls)
+
+    # Parse and extract the pages, either here or in a pool of worker processes
+    lesson_titles = [lesson_names[i][0] for i in range(len(lesson_names)) if lesson_extensions[i] not in completed]
+    extracted_pages = None
+    if processes > 1:
+        extracted_pages = extract_pages_parallel(pages, lesson_titles, processes, parser)
+    else:
+        extracted_pages = (extract_page(html, lesson_title, parser) for html, lesson_title in zip(pages, lesson_titles))
+
+    try:
+        # Go through the different pages and scrape their content
+        for i in range(len(lesson_names)):
+            extension = lesson_extensions[i]
+
+            if extension in completed:
+                yield completed[extension]
+                continue
+
+            lesson_tasks = next(extracted_pages)
+
+            # Only a lesson that produced tasks is recorded. A page that came back empty is more likely broken than empty,
+            # so a resumed run downloads it again. A page that could not be downloaded raises before it gets here
+            if checkpoint_path != None and len(lesson_tasks) > 0:
+                checkpoint_functions.record_lesson(checkpoint_path, extension, lesson_tasks, paid)
+
+            # Hand back the tasks of this lesson before moving on to the next page
+            yield lesson_tasks
+
+    finally:
+        # Stop the worker processes and close the browser once the lessons are done (or the caller stops early)
+        extracted_pages.close()
+        if driver != None and owns_driver:
+            driver.quit()
+        if session != None:
+            session.close()
@@ -0,0 +1,194 @@
+import json
+import os
+import unittest
+
+import bs4
+
+from scraping_beta import extraction_functions
+from scraping_beta import parsing_functions
+from scraping_beta import scraping_main
+
+# The recorded pages that ship with the repository
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# The tasks that the extract_* cascade produced from the fixture lesson pages, keyed by page name
+GOLDEN_TASKS_PATH = os.path.join(FIXTURES_DIR, "golden_tasks.json")
+
+
+"""
+* cascade_table : The table extraction as it was before classify_node, trying each extract_* function on every child of every td
+*
+* INPUTS
+* content : A parsed HTML node
+*
+* OUTPUTS
+* table_object (Dict) : The table content object, or None if nothing was found in the table
+"""
+def cascade_table(content):
+    table_content_array = []
+
+    for td in content.find_all('td'):
+        for child in td.find_all(recursive=False):
+            child_content = cascade_cell(child)
+            if child_content != None:
+                table_content_array.append(child_content)
+
+    if len(table_content_array) > 0:
+        return {'type' : 'table', 'content' : table_content_array}
+    return None
+
+
+"""
+* cascade_cell : The extract_* cascade that was run on each child of a table cell
+*
+* INPUTS
+* content : A parsed HTML node
+*
+* OUTPUTS
+* content_object (Dict) : The first content object found, or None
+"""
+def cascade_cell(content):
+    for extract in (
+        extraction_functions.extract_paragraphs,
+        extraction_functions.extract_audio_type_1,
+        extraction_functions.extract_audio_type_2,
+        extraction_functions.extract_image,
+        extraction_functions.extract_videos,
+    ):
+        content_object = extract(content)
+        if content_object != None:
+            return content_object
+    return None
+
+
+"""
+* cascade_node : The extract_* cascade that was run on each child of the blog content
+*
+* INPUTS
+* content : A parsed HTML node
+*
+* OUTPUTS
+* content_object (Dict) : The first content object found, or None
+"""
+def cascade_node(content):
+    for extract in (
+        cascade_table,
+        extraction_functions.extract_videos,
+        extraction_functions.extract_image,
+        extraction_functions.extract_audio_type_1,
+        extraction_functions.extract_audio_type_2,
+        extraction_functions.extract_paragraphs,
+    ):
+        content_object = extract(content)
+        if content_object != None:
+            return content_object
+    return None
+
+
+"""
+* cascade_tasks : extract_tasks as it was before classify_node
+*
+* INPUTS
+* doc : a Beautifulsoup HTML document object of a lesson page
+* lesson_title (String) : The title of the lesson that the page belongs to
+*
+* OUTPUTS
+* task_array (List) : (lesson_title, task_title, task_content) tuples
+"""
+def cascade_tasks(doc, lesson_title):
+    task_array = []
+
+    for task in doc.find_all(class_="blog-post"):
+        content = task.find(class_='blog-content')
+        task_title = task.find(class_='blog-title').text.strip()
+
+        task_content = []
+        for child in content.children:
+            if isinstance(child, bs4.Tag):
+                child_content = cascade_node(child)
+                if child_content != None:
+                    task_content.append(child_content)
+
+        task_array.append((lesson_title, task_title, task_content))
+
+    return task_array
+
+
+"""
+* load_lesson_pages : Parses every fixture lesson page
+*
+* OUTPUTS
+* pages (dict) : The parsed document of each page, keyed by page name (the file name without .html)
+"""
+def load_lesson_pages():
+    lesson_dir = os.path.join(FIXTURES_DIR, "lessons")
+    pages = {}
+
+    for file_name in sorted(os.listdir(lesson_dir)):
+        with open(os.path.join(lesson_dir, file_name), encoding="utf-8") as lesson_file:
+            pages[file_name[:-len(".html")]] = parsing_functions.parse_lesson_page(lesson_file.read())
+
+    return pages
+
+
+"""
+* as_json : Turns task tuples into the lists they become in JSON, so that they compare equal to the golden file
+"""
+def as_json(tasks):
+    return json.loads(json.dumps(tasks))
+
+
+class ClassifyNodeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pages = load_lesson_pages()
+
+        with open(GOLDEN_TASKS_PATH, encoding="utf-8") as golden_file:
+            cls.golden_tasks = json.load(golden_file)
+
+    def test_golden_file_covers_every_page(self):
+        self.assertEqual(sorted(self.golden_tasks), sorted(self.pages))
+
+    def test_golden_file_matches_cascade(self):
+        for name, doc in self.pages.items():
+            with self.subTest(page=name):
+                self.assertEqual(as_json(cascade_tasks(doc, name)), self.golden_tasks[name])
+
+    def test_extract_tasks_matches_golden_file(self):
+        for name, doc in self.pages.items():
+            with self.subTest(page=name):
+                self.assertEqual(as_json(scraping_main.extract_tasks(doc, name)), self.golden_tasks[name])
+
+    def test_classify_node_matches_cascade_on_every_node(self):
+        # Every element of the pages is checked, not only the children of the blog content
+        for name, doc in self.pages.items():
+            for node in doc.find_all(True):
+                with self.subTest(page=name, node=node.name, classes=node.get('class')):
+                    self.assertEqual(extraction_functions.classify_node(node), cascade_node(node))
+                    self.assertEqual(extraction_functions.classify_node(node, extraction_functions.TABLE_CELL_ORDER), cascade_cell(node))
+
+    def test_classify_node_on_small_trees(self):
+        cases = (
+            # A table wins over the media inside it, and its cells are read in the cell order
+            '<div><table><tr><td><div class="paragraph">Say "pat"</div><img src="/a.png"></td></tr></table></div>',
+            # The audio button has to carry the exact class string
+            '<div><a class="wsite-button wsite-button-small wsite-button-normal" href="/a.mp3">Play</a></div>',
+            '<div><a class="wsite-button wsite-button-normal wsite-button-small" href="/a.mp3">Play</a></div>',
+            # A video comes before an image, and an image before a paragraph
+            '<div><div class="paragraph">text</div><img src="/b.png"><iframe src="https://video"></iframe></div>',
+            # A node that is itself the content
+            '<audio src="/c.mp3"></audio>',
+            '<h2 class="wsite-content-title">Title</h2>',
+            # Nothing to extract
+            '<div><span>nothing</span></div>',
+        )
+
+        for html in cases:
+            node = bs4.BeautifulSoup(html, "html.parser").find(True)
+            with self.subTest(html=html):
+                self.assertEqual(extraction_functions.classify_node(node), cascade_node(node))
+                self.assertEqual(extraction_functions.classify_node(node, extraction_functions.TABLE_CELL_ORDER), cascade_cell(node))
+
+
+if __name__ == "__main__":
+    unittest.main()